@@ -1,54 +1,44 @@
-
 import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-from scipy.stats import jarque_bera, probplot
-from statsmodels.stats.diagnostic import het_breuschpagan
-from statsmodels.stats.stattools import durbin_watson
-
-from q2_config import OUT_DIR, SPMO_TICKER
-from q2_common import (
-    download_ff5_monthly,
-    download_spmo_monthly,
-    download_umd_factor,
-    merge_on_ym,
-)
 
-try:
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    HAS_MPL = True
-except Exception:
-    HAS_MPL = False
+from q2_config import (
+    BOOTSTRAP_BLOCK,
+    BOOTSTRAP_METHOD,
+    BOOTSTRAP_RESAMPLES,
+    BOOTSTRAP_SEED,
+    BOOTSTRAP_WORKERS,
+    COV_TYPE,
+    END_DATE,
+    HAC_MAXLAGS,
+    OUT_DIR,
+    ROLLING_WINDOW_MONTHS,
+)
+from q2_bootstrap import block_bootstrap
+from q2_common import FactorPanel, Q2Data
+from q2_diagnostics import residual_diagnostics
+from q2_kalman import kalman_beta
+from q2_ols import rolling_ols, statsmodels_cov
+import q2_plots
+from q2_store import write_run
 
-os.environ.setdefault("MPLCONFIGDIR", OUT_DIR)
 
+def main(ctx=None):
+    import statsmodels.api as sm
 
-def main():
+    ctx = ctx or Q2Data()
     print("=" * 60)
     print("Q2.1: SPMO beta to UMD factor")
     print("=" * 60)
-    spmo_returns = download_spmo_monthly(ticker=SPMO_TICKER)
-    df_umd = download_umd_factor()
-    ff5 = download_ff5_monthly()
-    # Merge SPMO with UMD on year-month
-    df_merged = merge_on_ym(spmo_returns, df_umd, left_name="SPMO")[["SPMO", "UMD"]].dropna()
-    # Merge with FF5 to get Mkt-RF and RF for market-controlled regression
-    ff5_reset = ff5.reset_index()
-    ff5_reset["ym"] = ff5_reset["Date"].dt.to_period("M")
-    umd_reset = df_umd.reset_index()
-    umd_reset["ym"] = umd_reset["Date"].dt.to_period("M")
-    ff6 = ff5_reset.merge(umd_reset[["ym", "UMD"]], on="ym", how="inner")
-    spmo_df = spmo_returns.reset_index()
-    spmo_df.columns = ["Date", "SPMO"]
-    spmo_df["ym"] = spmo_df["Date"].dt.to_period("M")
-    df_merged = spmo_df.merge(ff6.drop(columns=["Date"]), on="ym", how="inner")
-    df_merged = df_merged.set_index("Date")[["SPMO", "UMD", "Mkt-RF", "RF"]].dropna()
-    df_merged["SPMO_excess"] = df_merged["SPMO"] - df_merged["RF"]
+    spmo_returns = ctx.spmo
+    df_umd = ctx.umd
+    ff5 = ctx.ff5
+    # Align SPMO with FF5 + UMD by month (Mkt-RF and RF for the market-controlled regression)
+    panel = FactorPanel(ff5, df_umd, {"SPMO": spmo_returns}, dropna=True)
+    df_merged = panel.to_frame(["SPMO", "UMD", "Mkt-RF", "RF"])
+    df_merged["SPMO_excess"] = panel.excess("SPMO").to_numpy()
 
     # --- Debug: alignment and summary stats ---
     print("\n--- Merge debug: SPMO vs UMD ---")
@@ -71,7 +61,8 @@ def main():
 
     # (1) Simple regression: SPMO ~ UMD (for reference; biased by omitted market)
     X_simple = sm.add_constant(df_merged["UMD"])
-    model_simple = sm.OLS(df_merged["SPMO"], X_simple).fit()
+    cov = statsmodels_cov(COV_TYPE, len(df_merged), HAC_MAXLAGS)
+    model_simple = sm.OLS(df_merged["SPMO"], X_simple).fit(**cov)
     print("\n" + "=" * 60)
     print("(1) SIMPLE: SPMO = α + β(UMD) + ε  [omitted market bias]")
     print("=" * 60)
@@ -80,7 +71,7 @@ def main():
 
     # (2) Market-controlled: SPMO_excess ~ Mkt-RF + UMD (economically meaningful UMD beta)
     X_ff2 = sm.add_constant(df_merged[["Mkt-RF", "UMD"]])
-    model = sm.OLS(df_merged["SPMO_excess"], X_ff2).fit()
+    model = sm.OLS(df_merged["SPMO_excess"], X_ff2).fit(**cov)
     alpha = model.params["const"]
     beta_umd = model.params["UMD"]
     r2 = model.rsquared
@@ -98,13 +89,26 @@ def main():
     alpha_ann = (1 + alpha) ** 12 - 1
     print("Alpha (monthly): {:.6f}  ({:.2%} annualized)".format(alpha, alpha_ann))
 
-    jb_stat, jb_p = jarque_bera(residuals)
-    bp_stat, bp_p, _, _ = het_breuschpagan(residuals, X_ff2)
-    dw = durbin_watson(residuals)
+    diag = residual_diagnostics(residuals, X_ff2).iloc[0]
+    jb_stat, jb_p, bp_stat, bp_p, dw = diag[["jb", "jb_pvalue", "bp_lm", "bp_pvalue", "dw"]]
     print("\n--- Diagnostics (market-controlled model) ---")
     print("Jarque-Bera: {:.2f} (p={:.4f}), Breusch-Pagan: {:.2f} (p={:.4f}), Durbin-Watson: {:.2f}".format(
         jb_stat, jb_p, bp_stat, bp_p, dw))
 
+    # Figures are drawn in background processes while the bootstrap and Kalman fits run
+    figures = []
+    if np.isfinite(r2) and np.isfinite(residuals).all():
+        figures.append(q2_plots.render(
+            q2_plots.regression_diagnostics, "q2_1_spmo_umd_regression_diagnostics.png",
+            df_merged[["UMD", "SPMO_excess"]].assign(resid=residuals), alpha, beta_umd, r2))
+
+    boot = block_bootstrap(df_merged["SPMO_excess"], X_ff2, n_boot=BOOTSTRAP_RESAMPLES, block=BOOTSTRAP_BLOCK,
+                           method=BOOTSTRAP_METHOD, seed=BOOTSTRAP_SEED, workers=BOOTSTRAP_WORKERS)
+    print("\n--- Block bootstrap, 95% intervals ({} resamples, {} blocks of ~{} months) ---".format(
+        boot.attrs["n_boot"], boot.attrs["method"], boot.attrs["block"]))
+    print(boot.to_string(float_format="{:.4f}".format))
+    boot.to_csv(os.path.join(OUT_DIR, "q2_1_bootstrap_ci.csv"), index_label="Statistic")
+
     print("\n--- Variance decomposition (market-controlled) ---")
     print("Explained by Mkt-RF + UMD: {:.1f}%, Unexplained: {:.1f}%".format(r2 * 100, (1 - r2) * 100))
 
@@ -127,25 +131,65 @@ def main():
         ],
     })
     summary.to_csv(os.path.join(OUT_DIR, "q2_1_regression_summary.csv"), index=False)
+
+    # Full-precision results: the source of truth for q2_2 and the report, and for run-to-run comparison. The
+    # CSV above is a fixed, rounded summary for reading; new statistics go here (intervals: q2_1_bootstrap_ci.csv).
+    coefficients = []
+    for name, fit in (("simple", model_simple), ("market_controlled", model)):
+        for term in fit.params.index:
+            ci = boot.loc[term] if name == "market_controlled" else {}
+            coefficients.append({
+                "model": name, "term": term, "estimate": fit.params[term], "std_error": fit.bse[term],
+                "t_stat": fit.tvalues[term], "p_value": fit.pvalues[term],
+                "ci_low": ci.get("bca_low"), "ci_high": ci.get("bca_high"),
+            })
+    statistics = [
+        {"model": name, "statistic": stat, "value": value}
+        for name, fit in (("simple", model_simple), ("market_controlled", model))
+        for stat, value in (("rsquared", fit.rsquared), ("rsquared_adj", fit.rsquared_adj),
+                            ("resid_std", np.sqrt(fit.mse_resid)), ("nobs", fit.nobs))
+    ]
+    statistics += [{"model": "market_controlled", "statistic": stat, "value": value} for stat, value in (
+        ("alpha_annualized", alpha_ann),
+        ("alpha_annualized_bca_low", boot.loc["alpha_ann", "bca_low"]),
+        ("alpha_annualized_bca_high", boot.loc["alpha_ann", "bca_high"]),
+        *diag[["jb", "jb_pvalue", "bp_lm", "bp_pvalue", "dw"]].items(),
+    )]
+    statistics.append({"model": "data", "statistic": "corr_spmo_umd", "value": df_merged["SPMO"].corr(df_merged["UMD"])})
+    write_run("q2_1", coefficients, statistics, {
+        "sample_start": df_merged.index.min().date(), "sample_end": df_merged.index.max().date(),
+        "nobs": len(df_merged), "cov_type": COV_TYPE, "end_date": END_DATE,
+    })
     df_merged[["SPMO", "UMD"]].to_csv(os.path.join(OUT_DIR, "q2_1_spmo_umd_data.csv"))
-    print("\nSaved: q2_1_regression_summary.csv, q2_1_spmo_umd_data.csv")
-
-    if HAS_MPL and np.isfinite(r2) and np.isfinite(residuals).all():
-        fig, axes = plt.subplots(2, 2, figsize=(12, 9))
-        ax1, ax2, ax3, ax4 = axes.flat
-        ax1.scatter(df_merged["UMD"] * 100, df_merged["SPMO_excess"] * 100, alpha=0.6, s=25)
-        ax1.plot(df_merged["UMD"] * 100, (model.params["const"] + model.params["UMD"] * df_merged["UMD"]) * 100, "r-", lw=2,
-                 label="β_UMD={:.3f} (ctrl Mkt), R²={:.3f}".format(beta_umd, r2))
-        ax1.set_xlabel("UMD (%)"); ax1.set_ylabel("SPMO excess (%)"); ax1.legend(); ax1.grid(True, alpha=0.3)
-        ax2.plot(df_merged.index, residuals * 100, "o-", ms=2, alpha=0.7)
-        ax2.axhline(0, color="red", ls="--"); ax2.set_xlabel("Date"); ax2.set_ylabel("Residual (%)"); ax2.grid(True, alpha=0.3)
-        ax3.hist(residuals * 100, bins=25, density=True, alpha=0.7, edgecolor="k")
-        ax3.set_xlabel("Residual (%)"); ax3.set_ylabel("Density"); ax3.grid(True, alpha=0.3)
-        probplot(residuals, dist="norm", plot=ax4); ax4.set_title("Q-Q"); ax4.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUT_DIR, "q2_1_spmo_umd_regression_diagnostics.png"), dpi=150, bbox_inches="tight")
-        plt.close()
-        print("Saved: q2_1_spmo_umd_regression_diagnostics.png")
+    ctx.q1_merged = df_merged[["SPMO", "UMD"]]
+
+    # Rolling (trailing ROLLING_WINDOW_MONTHS) and expanding-window versions of the market-controlled model
+    rolling = rolling_ols(df_merged["SPMO_excess"], X_ff2, window=ROLLING_WINDOW_MONTHS, min_nobs=ROLLING_WINDOW_MONTHS,
+                          cov_type=COV_TYPE, maxlags=HAC_MAXLAGS)
+    expanding = rolling_ols(df_merged["SPMO_excess"], X_ff2, cov_type=COV_TYPE, maxlags=HAC_MAXLAGS)
+    cols = ["const", "Mkt-RF", "UMD", "t_UMD", "rsquared"]
+    betas = pd.concat([rolling[cols].add_prefix("rolling_"), expanding[cols].add_prefix("expanding_")], axis=1)
+    betas.dropna(how="all").to_csv(os.path.join(OUT_DIR, "q2_1_rolling_betas.csv"))
+    b = rolling["UMD"].dropna()
+    if len(b):
+        print("\nRolling {}m beta (UMD): min {:.4f}, median {:.4f}, max {:.4f}, latest {:.4f} ({})".format(
+            ROLLING_WINDOW_MONTHS, b.min(), b.median(), b.max(), b.iloc[-1], b.index[-1].strftime("%Y-%m")))
+
+    # Time-varying betas: random-walk Mkt-RF and UMD betas, static alpha (Kalman filter + RTS smoother, MLE variances)
+    kalman = kalman_beta(df_merged["SPMO_excess"], X_ff2)
+    kalman.smoothed.to_csv(os.path.join(OUT_DIR, "q2_1_kalman_betas.csv"))
+    k_umd = kalman.smoothed["UMD"]
+    print("\nKalman smoothed beta (UMD): min {:.4f}, max {:.4f}, latest {:.4f} [{:.4f}, {:.4f}]; "
+          "state s.d. per month: Mkt-RF {:.4f}, UMD {:.4f}".format(
+              k_umd.min(), k_umd.max(), k_umd.iloc[-1], kalman.smoothed["UMD_low"].iloc[-1],
+              kalman.smoothed["UMD_high"].iloc[-1], np.sqrt(kalman.params["q_Mkt-RF"]), np.sqrt(kalman.params["q_UMD"])))
+    print("\nSaved: q2_1_regression_summary.csv, q2_1_spmo_umd_data.csv, q2_1_rolling_betas.csv, q2_1_bootstrap_ci.csv, "
+          "q2_1_kalman_betas.csv")
+    if np.isfinite(r2) and np.isfinite(residuals).all():
+        figures.append(q2_plots.render(q2_plots.kalman_betas, "q2_1_kalman_betas.png",
+                                       kalman.smoothed, rolling, model.params))
+
+    q2_plots.finish(figures)
     print("\nDone. Outputs in:", OUT_DIR)
 
 
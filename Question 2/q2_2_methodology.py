@@ -1,7 +1,7 @@
+import csv
 import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-import pandas as pd
 
 from q2_config import (
     COMPARISON_FEATURES,
@@ -11,9 +11,10 @@ from q2_config import (
     SPMO_METHODOLOGY,
     UMD_METHODOLOGY,
 )
+from q2_store import load_run, lookup
 
 
-def main():
+def main(ctx=None):
     print("=" * 60)
     print("Q2.2: SPMO methodology vs UMD construction")
     print("=" * 60)
@@ -26,22 +27,23 @@ def main():
     for k, v in UMD_METHODOLOGY.items():
         print(f"  {k:<22}: {v}")
 
-    comparison = pd.DataFrame({
-        "Feature": COMPARISON_FEATURES,
-        "UMD (Fama-French)": COMPARISON_UMD,
-        "SPMO": COMPARISON_SPMO,
-    })
+    # Small text tables only: the csv module keeps this script free of pandas' import time
+    header = ["Feature", "UMD (Fama-French)", "SPMO"]
+    rows = list(zip(COMPARISON_FEATURES, COMPARISON_UMD, COMPARISON_SPMO))
+    widths = [max(len(str(r[i])) for r in [header] + rows) for i in range(len(header))]
     print("\n--- Comparison table ---")
-    print(comparison.to_string(index=False))
-    comparison.to_csv(os.path.join(OUT_DIR, "q2_2_methodology_comparison.csv"), index=False)
+    for r in [header] + rows:
+        print(" ".join(str(v).rjust(w) for v, w in zip(r, widths)))
+    with open(os.path.join(OUT_DIR, "q2_2_methodology_comparison.csv"), "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
     print("\nSaved: q2_2_methodology_comparison.csv")
 
-    summary_path = os.path.join(OUT_DIR, "q2_1_regression_summary.csv")
-    if os.path.isfile(summary_path):
-        s = pd.read_csv(summary_path)
-        beta_row = s[s["Metric"] == "Beta (UMD)"]
-        if not beta_row.empty:
-            beta_val = float(beta_row["Value"].iloc[0])
+    q1 = load_run("q2_1")
+    if q1 is not None:
+        beta_val = lookup(q1["coefficients"], "estimate", model="market_controlled", term="UMD")
+        if beta_val is not None:
             print("\n--- Observed beta (from Q2.1) ---")
             print(f"  Predicted β ≈ 0.20–0.30  |  Observed β = {beta_val:.2f}")
     print("\nDone. Outputs in:", OUT_DIR)
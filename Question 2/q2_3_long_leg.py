@@ -3,27 +3,12 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 
-from q2_config import OUT_DIR
-from q2_common import (
-    download_momentum_deciles,
-    download_spmo_monthly,
-    download_umd_factor,
-    load_q1_merged,
-    merge_on_ym,
-)
-from q2_config import SPMO_TICKER
-
-try:
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    HAS_MPL = True
-except Exception:
-    HAS_MPL = False
-
-os.environ.setdefault("MPLCONFIGDIR", OUT_DIR)
+from q2_asset_pricing import fama_macbeth, grs_test, rolling_grs
+from q2_config import COV_TYPE, FAMA_MACBETH_FACTORS, GRS_WINDOW_MONTHS, HAC_MAXLAGS, OUT_DIR
+from q2_common import FactorPanel, Q2Data
+from q2_ols import ols_univariate
+import q2_plots
 
 
 def _decile_sort(cols):
@@ -35,18 +20,13 @@ def _decile_sort(cols):
     return sorted([c for c in cols if key(c) > 0], key=key)
 
 
-def main():
+def main(ctx=None):
+    ctx = ctx or Q2Data()
     print("=" * 60)
     print("Q2.3: Beta to long-leg; VW vs EW momentum")
     print("=" * 60)
-    loaded = load_q1_merged()
-    if loaded is not None:
-        _, spmo_returns, df_umd = loaded
-        print("Using SPMO and UMD from q2_1_spmo_umd_data.csv")
-    else:
-        spmo_returns = download_spmo_monthly(ticker=SPMO_TICKER)
-        df_umd = download_umd_factor()
-    decile_data = download_momentum_deciles()
+    spmo_returns, df_umd = ctx.spmo_umd()
+    decile_data = ctx.deciles
     vw_cols = _decile_sort([c for c in decile_data.columns if "VW" in c or "VW_" in str(c)])
     ew_cols = _decile_sort([c for c in decile_data.columns if "EW" in c or "EW_" in str(c)])
     if not vw_cols:
@@ -65,19 +45,15 @@ def main():
         "MomLS_VW": mom_ls_vw, "MomLS_EW": mom_ls_ew,
         "UMD_Official": df_umd["UMD"],
     }).dropna()
-    models = {}
-    for name, xcol in [
-        ("Winners_VW", "Winners_VW"), ("Winners_EW", "Winners_EW"),
-        ("UMD_Official", "UMD_Official"), ("MomLS_VW", "MomLS_VW"), ("MomLS_EW", "MomLS_EW"),
-    ]:
-        X = sm.add_constant(spmo_mom[xcol])
-        models[name] = sm.OLS(spmo_mom["SPMO"], X).fit()
+    # SPMO on each momentum portfolio separately (constant + one regressor), all in one vectorized pass
+    names = ["Winners_VW", "Winners_EW", "UMD_Official", "MomLS_VW", "MomLS_EW"]
+    fits = ols_univariate(spmo_mom["SPMO"], spmo_mom[names], cov_type=COV_TYPE, maxlags=HAC_MAXLAGS)
     comp = pd.DataFrame({
-        "Model": list(models.keys()),
-        "Beta": [models[m].params.iloc[1] for m in models],
-        "T-stat": [models[m].tvalues.iloc[1] for m in models],
-        "R-squared": [models[m].rsquared for m in models],
-        "Alpha (annual %)": [models[m].params["const"] * 12 * 100 for m in models],
+        "Model": names,
+        "Beta": fits.params.loc["slope"].to_numpy(),
+        "T-stat": fits.tvalues.loc["slope"].to_numpy(),
+        "R-squared": fits.rsquared.to_numpy(),
+        "Alpha (annual %)": fits.params.loc["const"].to_numpy() * 12 * 100,
     })
     print("\n" + "=" * 60)
     print("SPMO vs LONG LEG and LONG-SHORT")
@@ -90,33 +66,44 @@ def main():
     cor_ew = spmo_mom["MomLS_EW"].corr(spmo_mom["UMD_Official"])
     print(f"Correlation with official UMD: MomLS_VW={cor_vw:.4f}, MomLS_EW={cor_ew:.4f}")
     comp.to_csv(os.path.join(OUT_DIR, "q2_3_all_models_summary.csv"), index=False)
+    # Drawn in the background while Fama-MacBeth and GRS run
+    order = ["Winners_VW", "Winners_EW", "UMD_Official", "MomLS_VW", "MomLS_EW"]
+    figures = [q2_plots.render(q2_plots.momentum_decomposition, "q2_3_momentum_decomposition.png",
+                               comp.set_index("Model").loc[order].reset_index())]
     pd.DataFrame({
         "Winners_VW": winners_vw, "Winners_EW": winners_ew,
         "Losers_VW": losers_vw, "Losers_EW": losers_ew,
         "MomLS_VW": mom_ls_vw, "MomLS_EW": mom_ls_ew,
         "UMD_Official": df_umd["UMD"],
     }).dropna().to_csv(os.path.join(OUT_DIR, "q2_3_momentum_portfolios.csv"))
-    print("Saved: q2_3_all_models_summary.csv, q2_3_momentum_portfolios.csv")
-    if HAS_MPL:
-        order = ["Winners_VW", "Winners_EW", "UMD_Official", "MomLS_VW", "MomLS_EW"]
-        comp_plot = comp.set_index("Model").loc[order].reset_index()
-        betas = comp_plot["Beta"]
-        r2s = comp_plot["R-squared"]
-        fig, axes = plt.subplots(1, 2, figsize=(12, 5))
-        colors = ["#2ecc71" if b > 0 else "#e74c3c" for b in betas]
-        axes[0].barh(comp_plot["Model"], betas, alpha=0.7, color=colors)
-        axes[0].set_xlabel("Beta"); axes[0].set_title("SPMO beta to momentum portfolios")
-        axes[0].axvline(0, color="black", linewidth=0.8)
-        b_max = max(abs(betas.max()), abs(betas.min()), 0.1)
-        axes[0].set_xlim(-b_max - 0.05, b_max + 0.05)
-        axes[0].grid(True, alpha=0.3, axis="x")
-        axes[1].barh(comp_plot["Model"], r2s, alpha=0.7, color="steelblue")
-        axes[1].set_xlabel("R²"); axes[1].set_title("R-squared"); axes[1].set_xlim(0, min(1.0, max(r2s) * 1.2 + 0.05))
-        axes[1].grid(True, alpha=0.3, axis="x")
-        plt.tight_layout()
-        plt.savefig(os.path.join(OUT_DIR, "q2_3_momentum_decomposition.png"), dpi=150, bbox_inches="tight")
-        plt.close()
-        print("Saved: q2_3_momentum_decomposition.png")
+
+    # Fama-MacBeth: are the factors priced across all 20 decile portfolios (every month with FF5, UMD and decile
+    # data, i.e. from the FF5 start in 1963-07)?
+    panel = FactorPanel(ctx.ff5, ctx.umd, decile_data)
+    deciles_excess = pd.DataFrame({c: panel.excess(c) for c in panel.assets}, index=panel.index)
+    fm = fama_macbeth(deciles_excess, panel.frame[FAMA_MACBETH_FACTORS])
+    print("\n" + "=" * 60)
+    print("FAMA-MACBETH: {} decile portfolios, {} months ({} to {})".format(
+        len(fm.betas), fm.nobs, fm.lambdas.index[0], fm.lambdas.index[-1]))
+    print("=" * 60)
+    print(fm.premia.to_string(float_format="{:.4f}".format))
+    print("Cross-sectional R² of mean excess returns: {:.4f}".format(fm.rsquared))
+    fm.premia.to_csv(os.path.join(OUT_DIR, "q2_3_fama_macbeth.csv"), index_label="Coefficient")
+    fm.betas.assign(pricing_error=fm.pricing_errors).to_csv(
+        os.path.join(OUT_DIR, "q2_3_fama_macbeth_assets.csv"), index_label="Portfolio")
+
+    # GRS: are the 20 deciles' alphas on the same factors jointly zero (full sample and rolling windows)?
+    grs = grs_test(deciles_excess, panel.frame[FAMA_MACBETH_FACTORS])
+    grs_roll = rolling_grs(deciles_excess, panel.frame[FAMA_MACBETH_FACTORS], GRS_WINDOW_MONTHS)
+    grs_roll.index = panel.dates
+    grs_roll = grs_roll.dropna(subset=["grs"])
+    print("GRS (alphas jointly zero, {} portfolios, {} months): F = {:.3f}, p = {:.4f}; rolling {}m: p < 0.05 in "
+          "{:.0%} of windows".format(grs.n_assets, grs.nobs, grs.stat, grs.pvalue, GRS_WINDOW_MONTHS,
+                                     (grs_roll["pvalue"] < 0.05).mean() if len(grs_roll) else np.nan))
+    grs_roll.to_csv(os.path.join(OUT_DIR, "q2_3_grs_rolling.csv"), index_label="Date")
+    print("Saved: q2_3_all_models_summary.csv, q2_3_momentum_portfolios.csv, q2_3_fama_macbeth.csv, "
+          "q2_3_fama_macbeth_assets.csv, q2_3_grs_rolling.csv")
+    q2_plots.finish(figures)
     print("\nDone. Outputs in:", OUT_DIR)
 
 
@@ -2,46 +2,26 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 import pandas as pd
-import statsmodels.api as sm
 
-from q2_config import OUT_DIR
-from q2_common import (
-    download_ff5_monthly,
-    download_spmo_monthly,
-    download_umd_factor,
-    load_q1_merged,
-    merge_on_ym,
-)
-from q2_config import SPMO_TICKER
+from q2_config import COV_TYPE, HAC_MAXLAGS, OUT_DIR, ROLLING_WINDOW_MONTHS
+from q2_common import FactorPanel, Q2Data
+from q2_ols import rolling_ols, statsmodels_cov
 
 
-def main():
+def main(ctx=None):
+    import statsmodels.api as sm
+
+    ctx = ctx or Q2Data()
     print("=" * 60)
     print("Q2.4: Fama-French 6-factor controls")
     print("=" * 60)
-    loaded = load_q1_merged()
-    if loaded is not None:
-        _, spmo_returns, df_umd = loaded
-        print("Using SPMO and UMD from q2_1_spmo_umd_data.csv")
-    else:
-        spmo_returns = download_spmo_monthly(ticker=SPMO_TICKER)
-        df_umd = download_umd_factor()
-    ff5 = download_ff5_monthly()
-    ff5_reset = ff5.reset_index()
-    ff5_reset["ym"] = ff5_reset["Date"].dt.to_period("M")
-    umd_reset = df_umd.reset_index()
-    umd_reset["ym"] = umd_reset["Date"].dt.to_period("M")
-    ff6 = ff5_reset.merge(umd_reset[["ym", "UMD"]], on="ym", how="inner")
-    spmo_df = spmo_returns.reset_index()
-    spmo_df.columns = ["Date", "SPMO"]
-    spmo_df["ym"] = spmo_df["Date"].dt.to_period("M")
-    merge_df = spmo_df.merge(ff6.drop(columns=["Date"]), on="ym", how="inner")
-    merge_df["SPMO_excess"] = merge_df["SPMO"] - merge_df["RF"]
-    merge_df = merge_df.set_index("Date")
-    X_capm = sm.add_constant(merge_df["Mkt-RF"])
-    capm = sm.OLS(merge_df["SPMO_excess"], X_capm).fit()
-    X_ff6 = sm.add_constant(merge_df[["Mkt-RF", "SMB", "HML", "RMW", "CMA", "UMD"]])
-    ff6_model = sm.OLS(merge_df["SPMO_excess"], X_ff6).fit()
+    spmo_returns, df_umd = ctx.spmo_umd()
+    ff5 = ctx.ff5
+    panel = FactorPanel(ff5, df_umd, {"SPMO": spmo_returns}, dropna=True)
+    spmo_excess = panel.excess("SPMO")
+    cov = statsmodels_cov(COV_TYPE, len(spmo_excess), HAC_MAXLAGS)
+    capm = sm.OLS(spmo_excess, panel.frame[FactorPanel.CAPM]).fit(**cov)
+    ff6_model = sm.OLS(spmo_excess, panel.frame[FactorPanel.FF6]).fit(**cov)
     print("\n" + "=" * 60)
     print("FAMA-FRENCH 6-FACTOR MODEL")
     print("=" * 60)
@@ -55,7 +35,12 @@ def main():
     })
     print(summary_ff6.to_string(index=False))
     summary_ff6.to_csv(os.path.join(OUT_DIR, "q2_4_ff6_regression_results.csv"), index=False)
-    print("\nSaved: q2_4_ff6_regression_results.csv")
+    rolling = rolling_ols(spmo_excess, panel.frame[FactorPanel.FF6],
+                          window=ROLLING_WINDOW_MONTHS, min_nobs=ROLLING_WINDOW_MONTHS,
+                          cov_type=COV_TYPE, maxlags=HAC_MAXLAGS)
+    rolling.index = panel.dates
+    rolling.dropna(subset=["const"]).to_csv(os.path.join(OUT_DIR, "q2_4_ff6_rolling_betas.csv"))
+    print("\nSaved: q2_4_ff6_regression_results.csv, q2_4_ff6_rolling_betas.csv")
     print("\n--- CAPM vs FF6 market beta ---")
     print(f"  CAPM market beta: {capm.params['Mkt-RF']:.4f}")
     print(f"  FF6 market beta:  {ff6_model.params['Mkt-RF']:.4f}")
@@ -1,67 +1,225 @@
+"""Q2.5: FF6 loadings of other momentum ETFs.
+
+    python q2_5_other_etfs.py                        # OTHER_ETF_TICKERS from q2_config.py
+    python q2_5_other_etfs.py --universe etfs.csv    # scan a ticker universe (resumable)
+
+A universe file has one ticker per line, or is a CSV whose first column (or "ticker" column) holds the tickers.
+The scan splits the tickers into chunks of UNIVERSE_CHUNK_SIZE; each chunk is downloaded and fitted in one batch
+on a process pool, and written to UNIVERSE_PARTS_DIR as a parquet part as soon as it finishes. A failed chunk
+download is retried ticker by ticker, and tickers without enough data get an error row instead of loadings.
+Rerunning skips tickers that already have loadings (errors are retried); --restart discards earlier parts.
+All parts are combined into q2_5_universe_ff6.parquet (latest row per ticker), with Jarque-Bera and Breusch-Pagan
+p-values and Durbin-Watson for each regression.
+"""
+import argparse
 import os
+import shutil
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-
-from q2_config import OUT_DIR, OTHER_ETF_TICKERS
-from q2_common import (
-    download_ff5_monthly,
-    download_spmo_monthly,
-    download_umd_factor,
-    load_q1_merged,
+
+from q2_config import (
+    COV_TYPE,
+    HAC_MAXLAGS,
+    OTHER_ETF_TICKERS,
+    OUT_DIR,
+    UNIVERSE_CHUNK_SIZE,
+    UNIVERSE_MIN_MONTHS,
+    UNIVERSE_PARTS_DIR,
+    UNIVERSE_WORKERS,
 )
+from q2_asset_pricing import grs_test
+from q2_common import FactorPanel, Q2Data, download_etf_monthly
+from q2_diagnostics import batch_residuals, residual_diagnostics
+from q2_ols import ols_many
+
+SCAN_DIAGNOSTICS = ["jb_pvalue", "bp_pvalue", "dw"]
+SCAN_COLUMNS = ["ticker", "alpha_ann"] + FactorPanel.FF6[1:] + ["R2", "nobs"] + SCAN_DIAGNOSTICS + ["error"]
+
+
+def ff6_fits(etf_returns, ff5, df_umd, diagnostics=False):
+    """FF6 regressions of every ETF's excess return, in one batch (each on its own available months).
+
+    With diagnostics=True, returns (fits, residual diagnostics table indexed by ticker).
+    """
+    panel = FactorPanel(ff5, df_umd, etf_returns)
+    excess = pd.DataFrame({t: panel.excess(t) for t in panel.assets}, index=panel.index)
+    X = panel.frame[FactorPanel.FF6]
+    fits = ols_many(excess, X, cov_type=COV_TYPE, maxlags=HAC_MAXLAGS)
+    if not diagnostics:
+        return fits
+    return fits, residual_diagnostics(batch_residuals(excess, X, fits.params), X)
+
+
+def loading_row(ticker, fits):
+    """Output row for one ticker: annualized alpha (%), FF6 betas, R² and sample size."""
+    params = fits.params[ticker]
+    row = {"ticker": ticker, "alpha_ann": ((1 + params["const"]) ** 12 - 1) * 100}
+    row.update({f: params[f] for f in FactorPanel.FF6[1:]})
+    row.update({"R2": fits.rsquared[ticker], "nobs": int(fits.nobs[ticker])})
+    return row
+
+
+def read_universe(path):
+    """Unique tickers (upper case, file order) from a universe file; blank lines and '#' comments are ignored."""
+    tickers = []
+    with open(path) as f:
+        for i, line in enumerate(f):
+            field = line.split("#", 1)[0].split(",", 1)[0].strip().strip('"').upper()
+            if field and not (i == 0 and field in ("TICKER", "SYMBOL")):
+                tickers.append(field)
+    return list(dict.fromkeys(tickers))
+
+
+def _error_rows(tickers, e):
+    return [{"ticker": t, "error": f"{type(e).__name__}: {e}"} for t in tickers]
+
 
+def _scan_chunk(tickers, ff5, df_umd):
+    """Loadings (or error rows) for one chunk; runs in a worker process."""
+    try:
+        returns = download_etf_monthly(tickers)
+    except Exception as e:
+        if len(tickers) == 1:
+            return _error_rows(tickers, e)
+        return [row for t in tickers for row in _scan_chunk([t], ff5, df_umd)]
+    try:
+        fits, diag = ff6_fits(returns, ff5, df_umd, diagnostics=True)
+    except Exception as e:
+        return _error_rows(tickers, e)
+    rows = []
+    for t in tickers:
+        n = int(fits.nobs[t])
+        if n < UNIVERSE_MIN_MONTHS:
+            rows.append({"ticker": t, "error": "no price data" if n == 0 else f"only {n} months of returns"})
+        else:
+            rows.append({**loading_row(t, fits), **diag.loc[t, SCAN_DIAGNOSTICS].to_dict()})
+    return rows
 
-def main():
+
+def _read_parts(parts_dir):
+    """All rows written so far, oldest part first (empty frame if none)."""
+    if not os.path.isdir(parts_dir):
+        return pd.DataFrame(columns=SCAN_COLUMNS)
+    paths = sorted(p for p in os.listdir(parts_dir) if p.endswith(".parquet"))
+    if not paths:
+        return pd.DataFrame(columns=SCAN_COLUMNS)
+    return pd.concat([pd.read_parquet(os.path.join(parts_dir, p)) for p in paths], ignore_index=True)
+
+
+def _write_part(parts_dir, rows):
+    """Write one finished chunk atomically; names sort in completion order."""
+    part = pd.DataFrame(rows, columns=SCAN_COLUMNS).astype({"nobs": "Int64", "error": "string"})
+    path = os.path.join(parts_dir, f"part-{time.time_ns()}.parquet")
+    part.to_parquet(path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def scan_universe(tickers, ctx=None, workers=None, chunk_size=None, parts_dir=None, restart=False):
+    """FF6 loadings for a large ticker list on a process pool, streamed to parquet parts; returns the combined frame."""
+    ctx = ctx or Q2Data()
+    parts_dir = parts_dir or UNIVERSE_PARTS_DIR
+    chunk_size = chunk_size or UNIVERSE_CHUNK_SIZE
+    if restart and os.path.isdir(parts_dir):
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    done = _read_parts(parts_dir)
+    done = set(done.loc[done["error"].isna(), "ticker"])
+    todo = [t for t in tickers if t not in done]
+    print(f"Universe: {len(tickers)} tickers, {len(tickers) - len(todo)} already done, {len(todo)} to scan")
+    if todo:
+        _, df_umd = ctx.spmo_umd()
+        ff5 = ctx.ff5
+        chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+        workers = min(workers or UNIVERSE_WORKERS or os.cpu_count() or 1, len(chunks))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_scan_chunk, chunk, ff5, df_umd): chunk for chunk in chunks}
+            for i, fut in enumerate(as_completed(futures), 1):
+                try:
+                    rows = fut.result()
+                except Exception as e:  # e.g. a worker process died
+                    rows = _error_rows(futures[fut], e)
+                _write_part(parts_dir, rows)
+                n_err = sum(1 for r in rows if r.get("error"))
+                print(f"  [{i}/{len(chunks)}] {len(rows) - n_err} ok, {n_err} failed")
+
+    results = _read_parts(parts_dir).drop_duplicates("ticker", keep="last").set_index("ticker")
+    results = results.loc[[t for t in tickers if t in results.index]].reset_index()
+    results.to_parquet(os.path.join(OUT_DIR, "q2_5_universe_ff6.parquet"), index=False)
+    n_err = int(results["error"].notna().sum())
+    print(f"\nSaved: q2_5_universe_ff6.parquet ({len(results) - n_err} with loadings, {n_err} failed)")
+    return results
+
+
+def main(ctx=None):
+    ctx = ctx or Q2Data()
     print("=" * 60)
     print("Q2.5: Other momentum ETFs – FF6 loadings")
     print("=" * 60)
-    loaded = load_q1_merged()
-    if loaded is not None:
-        _, _, df_umd = loaded
-        print("Using UMD from q2_1_spmo_umd_data.csv")
-    else:
-        df_umd = download_umd_factor()
-    ff5 = download_ff5_monthly()
-    ff5_reset = ff5.reset_index()
-    ff5_reset["ym"] = ff5_reset["Date"].dt.to_period("M")
-    umd_reset = df_umd.reset_index()
-    umd_reset["ym"] = umd_reset["Date"].dt.to_period("M")
-    ff6 = ff5_reset.merge(umd_reset[["ym", "UMD"]], on="ym", how="inner")
+    spmo_returns, df_umd = ctx.spmo_umd()
+    ff5 = ctx.ff5
     results = []
+    print()
+    try:
+        etf_returns = ctx.other_etfs
+        batch_error = None
+    except Exception as e:
+        etf_returns, batch_error = pd.DataFrame(), str(e)
+    fits = ff6_fits(etf_returns, ff5, df_umd)
     for ticker, name in OTHER_ETF_TICKERS:
-        print(f"\nDownloading {ticker} ({name})...")
-        try:
-            ret = download_spmo_monthly(ticker=ticker)
-            ret.name = ticker
-        except Exception as e:
-            print(f"  Skip {ticker}: {e}")
-            results.append({"ticker": ticker, "name": name, "error": str(e)})
+        ret = etf_returns[ticker].dropna() if ticker in etf_returns else pd.Series(dtype="float64")
+        if ret.empty:
+            err = batch_error or "no price data"
+            print(f"  Skip {ticker}: {err}")
+            results.append({"ticker": ticker, "name": name, "error": err})
             continue
-        ret_df = ret.reset_index()
-        ret_df.columns = ["Date", ticker]
-        ret_df["ym"] = ret_df["Date"].dt.to_period("M")
-        merge_df = ret_df.merge(ff6, on="ym", how="inner")
-        merge_df[f"{ticker}_excess"] = merge_df[ticker] - merge_df["RF"]
-        X = sm.add_constant(merge_df[["Mkt-RF", "SMB", "HML", "RMW", "CMA", "UMD"]])
-        model = sm.OLS(merge_df[f"{ticker}_excess"], X).fit()
-        results.append({
-            "ticker": ticker, "name": name,
-            "alpha_ann": ((1 + model.params["const"]) ** 12 - 1) * 100,
-            "Mkt-RF": model.params["Mkt-RF"], "SMB": model.params["SMB"],
-            "HML": model.params["HML"], "RMW": model.params["RMW"], "CMA": model.params["CMA"],
-            "UMD": model.params["UMD"], "R2": model.rsquared, "nobs": int(model.nobs),
-        })
-        print(f"  {ticker} FF6: Mkt-RF={model.params['Mkt-RF']:.3f}, SMB={model.params['SMB']:.3f}, UMD={model.params['UMD']:.3f}, R2={model.rsquared:.3f}")
+        ret.name = ticker
+        print(f"  {ticker} ({name}): {ret.index.min().strftime('%Y-%m')} to {ret.index.max().strftime('%Y-%m')}, n={len(ret)}")
+        row = loading_row(ticker, fits)
+        results.append({"ticker": ticker, "name": name, **{k: v for k, v in row.items() if k != "ticker"}})
+        print(f"  {ticker} FF6: Mkt-RF={row['Mkt-RF']:.3f}, SMB={row['SMB']:.3f}, UMD={row['UMD']:.3f}, R2={row['R2']:.3f}")
     ok = [r for r in results if "error" not in r]
     if ok:
         pd.DataFrame([{k: v for k, v in r.items() if k != "name"} for r in ok]).to_csv(
             os.path.join(OUT_DIR, "q2_5_other_etfs_ff6.csv"), index=False
         )
     print("\nSaved: q2_5_other_etfs_ff6.csv")
+
+    # GRS: FF6 alphas of SPMO and the other ETFs jointly zero (on the months all of them trade)
+    assets = {"SPMO": spmo_returns, **{r["ticker"]: etf_returns[r["ticker"]] for r in ok}}
+    panel = FactorPanel(ff5, df_umd, assets)
+    excess = pd.DataFrame({t: panel.excess(t) for t in panel.assets}, index=panel.index)
+    try:
+        grs = grs_test(excess, panel.frame[FactorPanel.FF6[1:]])
+    except ValueError as e:
+        print(f"GRS skipped: {e}")
+    else:
+        print("GRS (FF6 alphas of {} jointly zero, {} months): F = {:.3f}, p = {:.4f}".format(
+            ", ".join(panel.assets), grs.nobs, grs.stat, grs.pvalue))
+        pd.DataFrame({
+            "ticker": list(grs.alphas.index) + ["GRS"],
+            "alpha_ann": list(((1 + grs.alphas) ** 12 - 1) * 100) + [np.nan],
+            "grs": [np.nan] * grs.n_assets + [grs.stat],
+            "pvalue": [np.nan] * grs.n_assets + [grs.pvalue],
+            "nobs": [grs.nobs] * (grs.n_assets + 1),
+        }).to_csv(os.path.join(OUT_DIR, "q2_5_grs.csv"), index=False)
+        print("Saved: q2_5_grs.csv")
     print("\nDone. Outputs in:", OUT_DIR)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Q2.5: FF6 loadings of other momentum ETFs.")
+    parser.add_argument("--universe", metavar="FILE", help="scan every ticker in FILE instead of OTHER_ETF_TICKERS")
+    parser.add_argument("--workers", type=int, help="worker processes (default UNIVERSE_WORKERS / all CPUs)")
+    parser.add_argument("--chunk-size", type=int, help="tickers per task (default UNIVERSE_CHUNK_SIZE)")
+    parser.add_argument("--restart", action="store_true", help="discard results of earlier runs of this scan")
+    args = parser.parse_args()
+    if args.universe:
+        scan_universe(read_universe(args.universe), workers=args.workers, chunk_size=args.chunk_size,
+                      restart=args.restart)
+    else:
+        main()
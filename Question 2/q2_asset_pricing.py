@@ -0,0 +1,138 @@
+"""Cross-sectional asset-pricing tests on portfolio returns.
+
+fama_macbeth runs the two-pass Fama-MacBeth procedure: first-pass time-series betas for every test asset come
+from one ols_many batch, and the month-by-month cross-sectional regressions are a second ols_many batch with
+months as responses and assets as rows, so months with the same set of reporting assets share a single
+factorization. This is what keeps Ken French's 100-portfolio files (with missing early months) cheap.
+
+grs_test and rolling_grs run the Gibbons-Ross-Shanken test that all alphas are jointly zero. Both work from the
+Gram matrix of [1, factors, returns]: alphas, the residual covariance and the factor moments all come out of one
+batched solve, and rolling windows get their Gram matrices from running sums instead of refits.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from q2_ols import _window_sums, ols_many
+
+FamaMacBeth = namedtuple("FamaMacBeth", ["premia", "betas", "lambdas", "pricing_errors", "rsquared", "nobs"])
+GRSTest = namedtuple("GRSTest", ["stat", "pvalue", "alphas", "nobs", "n_assets", "n_factors"])
+
+
+def fama_macbeth(R, F, intercept=True):
+    """Fama-MacBeth risk premia of the factors F (months x K) on the test-asset excess returns R (months x N).
+
+    Betas are full-sample time-series slopes on F (each asset on the months it reports). Each month's returns are
+    then regressed on [1, betas]; premia are the time-series means of those coefficients. Standard errors are the
+    Fama-MacBeth ones and the Shanken (1992) errors-in-variables correction: c * V_FM + Sigma_f / T on the
+    factor premia, c = 1 + lambda' Sigma_f^-1 lambda (intercept: c * V_FM). p-values use Shanken errors.
+
+    Returns FamaMacBeth(premia, betas (N x K), lambdas (months x coefficients), pricing_errors (mean return
+    minus fitted, per asset), rsquared (cross-sectional R² of mean returns), nobs (months used)).
+    """
+    from scipy import stats
+
+    F = F.dropna()
+    R = R.reindex(F.index)
+    factors = list(F.columns)
+    X = F.copy()
+    X.insert(0, "const", 1.0)
+    betas = ols_many(R, X).params.loc[factors].T
+    betas = betas[betas.notna().all(axis=1)]
+
+    Z = betas.copy()
+    if intercept:
+        Z.insert(0, "const", 1.0)
+    cross = ols_many(R[betas.index].T, Z)
+    lambdas = cross.params.T.dropna()
+    lambdas.index.name = F.index.name
+    T = len(lambdas)
+    if T < 2:
+        raise ValueError(f"fama_macbeth needs at least two months with a cross-sectional fit, got {T}")
+
+    est = lambdas.mean()
+    v_fm = np.atleast_2d(np.cov(lambdas.to_numpy(), rowvar=False)) / T
+    sigma_f = np.atleast_2d(np.cov(F.loc[lambdas.index].to_numpy(), rowvar=False))
+    lam_f = est[factors].to_numpy()
+    c = 1.0 + lam_f @ np.linalg.solve(sigma_f, lam_f)
+    v_shanken = c * v_fm
+    f_pos = [list(lambdas.columns).index(f) for f in factors]
+    v_shanken[np.ix_(f_pos, f_pos)] += sigma_f / T
+
+    se_fm = np.sqrt(np.diag(v_fm))
+    se_sh = np.sqrt(np.diag(v_shanken))
+    premia = pd.DataFrame({
+        "lambda": est, "se_fm": se_fm, "t_fm": est / se_fm,
+        "se_shanken": se_sh, "t_shanken": est / se_sh,
+        "p_shanken": 2 * stats.t.sf(np.abs(est / se_sh), T - 1),
+    }, index=lambdas.columns)
+
+    mean_ret = R.loc[lambdas.index, betas.index].mean()
+    fitted = Z.to_numpy() @ est.to_numpy()
+    pricing_errors = mean_ret - fitted
+    rsquared = 1 - pricing_errors.var() / mean_ret.var()
+    return FamaMacBeth(premia, betas, lambdas, pricing_errors, rsquared, T)
+
+
+def _grs_from_gram(G, T, L):
+    """GRS statistic, p-value and alphas for a stack of Gram matrices G (W x p x p) of [1, L factors, N assets].
+
+    Uses ML moments (divide by T): GRS = (T - N - L) / N * a' S^-1 a / (1 + mu' Omega^-1 mu) ~ F(N, T - N - L).
+    """
+    from scipy import stats
+
+    k = 1 + L
+    N = G.shape[1] - k
+    XX, XR, RR = G[:, :k, :k], G[:, :k, k:], G[:, k:, k:]
+    B = np.linalg.solve(XX, XR)
+    alphas = B[:, 0, :]
+    S = (RR - np.einsum("wki,wkj->wij", XR, B)) / T[:, None, None]
+    mu = G[:, 0, 1:k] / T[:, None]
+    omega = G[:, 1:k, 1:k] / T[:, None, None] - np.einsum("wi,wj->wij", mu, mu)
+    q = np.einsum("wi,wi->w", alphas, np.linalg.solve(S, alphas[:, :, None])[:, :, 0])
+    d = 1 + np.einsum("wi,wi->w", mu, np.linalg.solve(omega, mu[:, :, None])[:, :, 0])
+    df2 = T - N - L
+    stat = df2 / N * q / d
+    return stat, stats.f.sf(stat, N, df2), alphas
+
+
+def _gram_rows(R, F):
+    """Per-month [1, F, R] rows (zeroed where any value is missing) and the complete-month mask."""
+    Z = np.column_stack([np.ones(len(F)), F.to_numpy(dtype="float64"), R.to_numpy(dtype="float64")])
+    ok = np.isfinite(Z).all(axis=1)
+    return np.where(ok[:, None], Z, 0.0), ok
+
+
+def grs_test(R, F):
+    """Gibbons-Ross-Shanken test that the alphas of all assets in R (months x N) on factors F are jointly zero.
+
+    Uses the months where every asset and factor is present (the test needs a balanced panel and T > N + L).
+    Returns GRSTest(stat, pvalue, alphas (Series per asset), nobs, n_assets, n_factors).
+    """
+    F = F.loc[R.index]
+    Z, ok = _gram_rows(R, F)
+    T, N, L = int(ok.sum()), R.shape[1], F.shape[1]
+    if T <= N + L:
+        raise ValueError(f"GRS needs more months than assets + factors ({N} + {L}), got {T} complete months")
+    stat, pvalue, alphas = _grs_from_gram((Z.T @ Z)[None], np.array([float(T)]), L)
+    return GRSTest(float(stat[0]), float(pvalue[0]), pd.Series(alphas[0], index=R.columns), T, N, L)
+
+
+def rolling_grs(R, F, window, min_nobs=None):
+    """GRS test over trailing windows of `window` months (complete months only, at least min_nobs of them,
+    default window). Returns a frame on R's index with grs, pvalue and nobs (NaN where a window is too short).
+    """
+    F = F.loc[R.index]
+    Z, ok = _gram_rows(R, F)
+    N, L = R.shape[1], F.shape[1]
+    min_nobs = max(window if min_nobs is None else min_nobs, N + L + 1)
+    nobs = _window_sums(ok.astype("float64"), window)
+    G = _window_sums(np.einsum("ti,tj->tij", Z, Z), window)
+    out = pd.DataFrame({"grs": np.nan, "pvalue": np.nan, "nobs": nobs.astype(int)}, index=R.index)
+    fit = nobs >= min_nobs
+    if fit.any():
+        stat, pvalue, _ = _grs_from_gram(G[fit], nobs[fit], L)
+        out.loc[fit, "grs"] = stat
+        out.loc[fit, "pvalue"] = pvalue
+    return out
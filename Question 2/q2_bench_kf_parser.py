@@ -0,0 +1,79 @@
+"""Benchmark q2_common.parse_kf_sections against the previous line-by-line Ken French parser.
+
+Usage:
+    python q2_bench_kf_parser.py                  # downloads the 100-portfolio and daily factor files
+    python q2_bench_kf_parser.py a.zip b.zip ...  # local Ken French CSV zips
+Downloads go through q2_common.http_get, so Q2_DATA_MODE=record / replay applies.
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pandas as pd
+
+from q2_common import _unzip_text, http_get, parse_kf_sections
+
+BENCH_URLS = [
+    "https://mba.tuck.dartmouth.edu/pages/faculty/ken.french/ftp/100_Portfolios_10x10_CSV.zip",
+    "https://mba.tuck.dartmouth.edu/pages/faculty/ken.french/ftp/F-F_Research_Data_Factors_daily_CSV.zip",
+    "https://mba.tuck.dartmouth.edu/pages/faculty/ken.french/ftp/F-F_Momentum_Factor_daily_CSV.zip",
+]
+REPEATS = 5
+
+
+def _legacy_parse(raw):
+    """The pre-vectorization approach (per-line split, per-column to_numeric), generalized to every section."""
+    frames = []
+    rows = []
+    lines = raw.split("\n")
+    for line in lines + [""]:
+        parts = [x.strip() for x in line.split(",")]
+        if parts and len(parts[0]) in (4, 6, 8) and parts[0].isdigit():
+            rows.append(parts)
+            continue
+        if rows:
+            d = pd.DataFrame(rows)
+            fmt = {4: "%Y", 6: "%Y%m", 8: "%Y%m%d"}[len(rows[0][0])]
+            d[0] = pd.to_datetime(d[0], format=fmt)
+            for c in d.columns[1:]:
+                d[c] = pd.to_numeric(d[c], errors="coerce")
+            frames.append(d.set_index(0))
+            rows = []
+    return frames
+
+
+def _load(src):
+    if os.path.isfile(src):
+        with open(src, "rb") as f:
+            return _unzip_text(f.read())
+    r = http_get(src, timeout=60)
+    r.raise_for_status()
+    return _unzip_text(r.content)
+
+
+def _best_of(fn, raw):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn(raw)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(sources=None):
+    sources = sources or BENCH_URLS
+    print(f"{'file':<45} {'MB':>6} {'cells':>10} {'legacy s':>9} {'new s':>8} {'speedup':>8}")
+    for src in sources:
+        raw = _load(src)
+        sections = parse_kf_sections(raw)
+        legacy = _legacy_parse(raw)
+        cells = sum(s.frame.size for s in sections)
+        assert cells == sum(f.size for f in legacy), "parsers disagree on section contents"
+        t_old = _best_of(_legacy_parse, raw)
+        t_new = _best_of(parse_kf_sections, raw)
+        name = os.path.basename(src)
+        print(f"{name:<45} {len(raw) / 1e6:>6.1f} {cells:>10,} {t_old:>9.3f} {t_new:>8.3f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,87 @@
+"""Benchmark q2_ols against a per-regression statsmodels loop on synthetic ETF panels (plain and HAC errors).
+
+Usage:
+    python q2_bench_ols.py            # 2000 ETFs, 120 months, FF6 design
+    python q2_bench_ols.py 10000      # number of ETFs
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+from q2_common import FactorPanel
+from q2_ols import ols_many, ols_univariate, statsmodels_cov
+
+N_MONTHS = 120
+N_ETFS = 2000
+REPEATS = 3
+
+
+def make_panel(n_etfs, n_months=N_MONTHS, seed=0):
+    """FF6 design plus ETF excess returns with staggered inception dates (many missing-data patterns)."""
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(0.005, 0.04, size=(n_months, 6)), columns=FactorPanel.FF6[1:])
+    X.insert(0, "const", 1.0)
+    Y = X.to_numpy() @ rng.normal(0.3, 0.5, size=(7, n_etfs)) + rng.normal(0, 0.02, size=(n_months, n_etfs))
+    start = rng.integers(0, n_months // 2, size=n_etfs)
+    Y[np.arange(n_months)[:, None] < start] = np.nan
+    return pd.DataFrame(Y, columns=[f"ETF{i}" for i in range(n_etfs)]), X
+
+
+def _statsmodels_many(Y, X, cov_type="nonrobust"):
+    out = {}
+    for c in Y.columns:
+        y = Y[c].dropna()
+        out[c] = sm.OLS(y, X.loc[y.index]).fit(**statsmodels_cov(cov_type, len(y)))
+    return out
+
+
+def _statsmodels_univariate(y, X):
+    return {c: sm.OLS(y, sm.add_constant(X[c])).fit() for c in X.columns}
+
+
+def _best_of(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _max_diff(batch, fits):
+    diff = 0.0
+    for c, f in fits.items():
+        for ours, theirs in [(batch.params[c], f.params), (batch.tvalues[c], f.tvalues), (batch.pvalues[c], f.pvalues)]:
+            diff = max(diff, float(np.abs(ours.to_numpy() - theirs.to_numpy()).max()))
+        diff = max(diff, abs(batch.rsquared[c] - f.rsquared), abs(batch.rsquared_adj[c] - f.rsquared_adj))
+    return diff
+
+
+def main(n_etfs=N_ETFS):
+    Y, X = make_panel(n_etfs)
+    print(f"{'case':<32} {'statsmodels s':>14} {'batched s':>10} {'fits/s':>10} {'max abs diff':>13}")
+
+    for cov_type in ("nonrobust", "HAC"):
+        fits = _statsmodels_many(Y, X, cov_type)
+        t_old = _best_of(lambda: _statsmodels_many(Y, X, cov_type))
+        t_new = _best_of(lambda: ols_many(Y, X, cov_type))
+        diff = _max_diff(ols_many(Y, X, cov_type), fits)
+        case = f"ols_many {cov_type} ({n_etfs} ETFs)"
+        print(f"{case:<32} {t_old:>14.3f} {t_new:>10.4f} {n_etfs / t_new:>10,.0f} {diff:>13.2e}")
+
+    y = Y.iloc[:, 0].fillna(0.0)
+    Xu = Y.iloc[:, 1:].fillna(0.0)
+    fits = _statsmodels_univariate(y, Xu)
+    t_old = _best_of(lambda: _statsmodels_univariate(y, Xu))
+    t_new = _best_of(lambda: ols_univariate(y, Xu))
+    diff = _max_diff(ols_univariate(y, Xu), fits)
+    n = Xu.shape[1]
+    print(f"{f'ols_univariate ({n} designs)':<32} {t_old:>14.3f} {t_new:>10.4f} {n / t_new:>10,.0f} {diff:>13.2e}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else N_ETFS)
@@ -0,0 +1,64 @@
+"""Cold import time of each Q2 / Q3 entry point, from `python -X importtime`.
+
+Usage:
+    python q2_bench_startup.py                 # every Q2 script and Question 3/code/run_analysis.py
+    python q2_bench_startup.py q2_report.py    # selected scripts (paths relative to this folder)
+Each script is imported (not run) in a fresh interpreter REPEATS times; the best cumulative import time is
+reported with the heaviest modules it pulls in directly. Heavy dependencies (statsmodels, scipy.stats,
+matplotlib, yfinance, requests, pyarrow) are imported on first use, so they should not appear here.
+"""
+import os
+import re
+import subprocess
+import sys
+
+Q2_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = [
+    "q2_1_spmo_umd_beta.py",
+    "q2_2_methodology.py",
+    "q2_3_long_leg.py",
+    "q2_4_ff6_controls.py",
+    "q2_5_other_etfs.py",
+    "q2_report.py",
+    "q2_run_all.py",
+    os.path.join("..", "Question 3", "code", "run_analysis.py"),
+]
+REPEATS = 5
+TOP_IMPORTS = 3
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(script):
+    """(total µs, {direct import: cumulative µs}) for one import of script in a fresh interpreter."""
+    path = os.path.normpath(os.path.join(Q2_DIR, script))
+    module = os.path.splitext(os.path.basename(path))[0]
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=os.path.dirname(path), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {script} failed:\n{proc.stderr[-2000:]}")
+    total, children = None, {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        depth = (len(m.group(3)) - 1) // 2
+        if depth == 0 and m.group(4) == module:
+            total = int(m.group(2))
+        elif depth == 1:
+            children[m.group(4)] = int(m.group(2))
+    return total, children
+
+
+def main(scripts=None):
+    scripts = scripts or ENTRY_POINTS
+    print(f"{'entry point':<28} {'import ms':>10}  heaviest direct imports (ms)")
+    for script in scripts:
+        runs = [import_times(script) for _ in range(REPEATS)]
+        total, children = min(runs, key=lambda r: r[0])
+        heavy = sorted(children.items(), key=lambda kv: -kv[1])[:TOP_IMPORTS]
+        name = os.path.basename(script)
+        print(f"{name:<28} {total / 1e3:>10.1f}  " + ", ".join(f"{m} {t / 1e3:.0f}" for m, t in heavy))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
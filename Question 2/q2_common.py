@@ -1,204 +1,501 @@
+import hashlib
+import json
 import os
+import re
+import time
+from collections import namedtuple
+from functools import cached_property
 from io import BytesIO, StringIO
 import zipfile
 
 import numpy as np
 import pandas as pd
-import requests
-import yfinance as yf
 
 from q2_config import (
+    CACHE_DIR,
+    CACHE_TTL_HOURS,
+    DATA_MODE,
     END_DATE,
+    FIXTURE_DIR,
+    OFFLINE,
+    OTHER_ETF_TICKERS,
     OUT_DIR,
+    PRICE_CACHE_DIR,
+    PRICE_FILE,
+    REFRESH_OVERLAP_MONTHS,
     REQUEST_TIMEOUT,
     RETURN_MAX,
     RETURN_MIN,
+    SPMO_TICKER,
     START_DATE,
     URL_DECILES,
     URL_FF5,
     URL_UMD,
 )
+from q2_fixtures import FixtureStore
 
 
-def download_spmo_monthly(ticker="SPMO", start=None, end=None):
-    """Download ETF monthly returns (default SPMO). Returns series with DatetimeIndex."""
-    start = start or START_DATE
-    end = end or END_DATE
-    print(f"Downloading {ticker} data...")
-    data = yf.download(ticker, start=start, end=end, progress=False, auto_adjust=True)
+_FIXTURES = FixtureStore(DATA_MODE, FIXTURE_DIR, "Q2_DATA_MODE")
+
+
+def http_get(url, headers=None, timeout=REQUEST_TIMEOUT):
+    """requests.get honouring DATA_MODE: record saves each 200 response to FIXTURE_DIR, replay serves it back."""
+    return _FIXTURES.http_get(url, headers=headers, timeout=timeout)
+
+
+def yf_download(tickers, **kwargs):
+    """yf.download honouring DATA_MODE (whole frames are recorded; see q2_fixtures)."""
+    return _FIXTURES.yf_download(list(tickers), **kwargs)
+
+
+def pyplot():
+    """matplotlib.pyplot on the Agg backend, imported on first use (None if matplotlib is unavailable)."""
+    os.environ.setdefault("MPLCONFIGDIR", OUT_DIR)
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except Exception:
+        return None
+    return plt
+
+
+def yahoo_price_source(tickers, start, end):
+    """Daily closes for all tickers from one Yahoo request. Returns DataFrame (dates x tickers)."""
+    tickers = list(tickers)
+    data = yf_download(tickers, start=start, end=end, progress=False, auto_adjust=True)
+    field = "Close"
     if data.empty:
-        data = yf.download(ticker, start=start, end=end, progress=False)
+        data = yf_download(tickers, start=start, end=end, progress=False, auto_adjust=False)
+        field = "Adj Close"
+    if data.empty:
+        return pd.DataFrame(columns=tickers, dtype="float64")
     if isinstance(data.columns, pd.MultiIndex):
-        data.columns = data.columns.get_level_values(0)
-    close = (
-        data["Adj Close"]
-        if "Adj Close" in data.columns
-        else data["Close"]
-        if "Close" in data.columns
-        else data.iloc[:, -1]
-    )
-    monthly = close.resample("ME").last().dropna()
-    ret = monthly.pct_change().replace([np.inf, -np.inf], np.nan).dropna()
-    ret = ret[(ret >= RETURN_MIN) & (ret <= RETURN_MAX)]
+        close = data[field if field in data.columns.get_level_values(0) else "Close"]
+    else:
+        close = data[[field if field in data.columns else "Close"]]
+        close.columns = tickers
+    return close.reindex(columns=tickers)
+
+
+def local_price_source(path):
+    """Price source backed by a local wide file of daily closes (CSV or parquet; date index, one column per ticker)."""
+    def source(tickers, start, end):
+        tickers = list(tickers)
+        if path.endswith(".parquet"):
+            close = pd.read_parquet(path)
+        else:
+            close = pd.read_csv(path, index_col=0, parse_dates=True)
+        close = close.reindex(columns=tickers)
+        close.index = pd.DatetimeIndex(close.index)
+        return close.loc[(close.index >= pd.Timestamp(start)) & (close.index < pd.Timestamp(end))]
+    return source
+
+
+def _frame_checksum(df):
+    """Checksum of values rounded to 6 decimals, for comparing a re-fetched overlap window with stored data."""
+    values = np.round(np.asarray(df, dtype="float64"), 6)
+    return hashlib.sha256(np.ascontiguousarray(values).tobytes()).hexdigest()
+
+
+def _read_price_store(store_dir, ticker):
+    path = os.path.join(store_dir, f"{ticker}.parquet")
+    return pd.read_parquet(path)[ticker] if os.path.isfile(path) else None
+
+
+def _write_price_store(store_dir, ticker, series):
+    _write_parquet_atomic(series.rename(ticker).to_frame(), os.path.join(store_dir, f"{ticker}.parquet"))
+
+
+def incremental_price_source(source, store_dir=None):
+    """Wrap a price source with an append-only on-disk store of daily closes (one parquet per ticker).
+
+    Tickers already stored from `start` or earlier fetch only the bars from the start of their last
+    REFRESH_OVERLAP_MONTHS stored months onward (one batched call), and the new bars are appended. If the
+    re-fetched overlap differs from the stored bars (history revised), that ticker is rebuilt from `start`.
+    Stores updated within CACHE_TTL_HOURS, or any store in OFFLINE mode, are used without fetching.
+    """
+    store_dir = store_dir or PRICE_CACHE_DIR
+
+    def fetch(tickers, start, end):
+        tickers = list(tickers)
+        os.makedirs(store_dir, exist_ok=True)
+        stored, full, stale = {}, [], []
+        for t in tickers:
+            series = _read_price_store(store_dir, t)
+            entry = _load_cache_entry(t, store_dir)
+            if series is None or series.empty or entry is None or pd.Timestamp(entry["start"]) > pd.Timestamp(start):
+                full.append(t)
+                continue
+            stored[t] = series
+            if not OFFLINE and time.time() - entry["updated"] >= CACHE_TTL_HOURS * 3600:
+                stale.append(t)
+        if full and OFFLINE:
+            raise RuntimeError(f"Offline mode (Q2_OFFLINE=1) and no stored prices for {', '.join(full)}")
+        appended = []
+        if stale:
+            since = min(stored[t].index.max().to_period("M") for t in stale) - (REFRESH_OVERLAP_MONTHS - 1)
+            since = since.to_timestamp()
+            fresh = source(stale, since, end)
+            for t in stale:
+                new = fresh[t].dropna() if t in fresh else pd.Series(dtype="float64")
+                old = stored[t][stored[t].index >= since]
+                overlap = new[new.index <= old.index.max()]
+                if not overlap.index.equals(old.index) or _frame_checksum(overlap) != _frame_checksum(old):
+                    full.append(t)
+                    continue
+                stored[t] = pd.concat([stored[t][stored[t].index < since], new])
+                appended.append(t)
+        rebuilt = []
+        if full:
+            fresh = source(full, start, end)
+            for t in full:
+                new = fresh[t].dropna() if t in fresh else pd.Series(dtype="float64")
+                if not new.empty:
+                    stored[t] = new
+                    rebuilt.append(t)
+        for t in appended + rebuilt:
+            _write_price_store(store_dir, t, stored[t])
+            _save_cache_entry(t, {"start": str(pd.Timestamp(start).date()), "updated": time.time()}, store_dir)
+        print(f"  Price store: {len(stored) - len(appended) - len(rebuilt)} up to date, "
+              f"{len(appended)} appended, {len(rebuilt)} full download(s)")
+        close = pd.DataFrame({t: stored[t] for t in tickers if t in stored}).reindex(columns=tickers)
+        return close.loc[(close.index >= pd.Timestamp(start)) & (close.index < pd.Timestamp(end))]
+    return fetch
+
+
+def default_price_source():
+    if PRICE_FILE:
+        return local_price_source(PRICE_FILE)
+    return incremental_price_source(yahoo_price_source)
+
+
+def monthly_returns(close):
+    """Month-end returns for every column of a daily close frame (vectorized across tickers).
+
+    Each ticker's return is measured against its previous month with data, as if that ticker's missing months
+    were dropped first. Returns outside [RETURN_MIN, RETURN_MAX] become NaN.
+    """
+    if close.index.tz is not None:
+        close = close.tz_localize(None)
+    monthly = close.resample("ME").last()
+    ret = (monthly / monthly.ffill().shift(1) - 1).where(monthly.notna())
+    ret = ret.replace([np.inf, -np.inf], np.nan)
+    return ret.where((ret >= RETURN_MIN) & (ret <= RETURN_MAX)).dropna(how="all")
+
+
+def download_etf_monthly(tickers, start=None, end=None, source=None):
+    """Download monthly returns for many ETFs in one batch. Returns wide DataFrame (month-end x tickers), NaN where missing."""
+    tickers = list(tickers)
+    start = start or START_DATE
+    end = end or END_DATE
+    source = source or default_price_source()
+    if len(tickers) <= 5:
+        print(f"Downloading {', '.join(tickers)} data...")
+    else:
+        print(f"Downloading data for {len(tickers)} tickers...")
+    close = source(tickers, start, end).astype("float64")
+    return monthly_returns(close).reindex(columns=tickers)
+
+
+def download_spmo_monthly(ticker="SPMO", start=None, end=None, source=None):
+    """Download ETF monthly returns (default SPMO). Returns series with DatetimeIndex."""
+    ret = download_etf_monthly([ticker], start=start, end=end, source=source)[ticker].dropna()
+    if ret.empty:
+        raise ValueError(f"No price data for {ticker}")
     ret.name = ticker
     print(f"  {ticker}: {ret.index.min().strftime('%Y-%m')} to {ret.index.max().strftime('%Y-%m')}, n={len(ret)}")
     return ret
 
 
+def _index_entry_path(index_dir, key):
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(index_dir, "index", f"{name}.json")
+
+
+def _load_cache_entry(key, index_dir=None):
+    """Index entry (dict) for one cached item (a Ken French URL or a ticker), or None."""
+    path = _index_entry_path(index_dir or CACHE_DIR, key)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_cache_entry(key, entry, index_dir=None):
+    """Write one index entry. Each key has its own file, so concurrent stages and Q2.5 universe-scan workers
+    never overwrite each other's entries; the per-process tmp file keeps each replace atomic."""
+    path = _index_entry_path(index_dir or CACHE_DIR, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"key": key, **entry}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _read_parquet_if_exists(path):
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        return None
+
+
+def _write_parquet_atomic(df, path):
+    """to_parquet via a per-process tmp file and os.replace, so concurrent readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+def _cache_key(url, etag, last_modified, content):
+    """Content address for a download: URL plus server validators, or URL plus body hash if the server sends none."""
+    h = hashlib.sha256(url.encode("utf-8"))
+    if etag or last_modified:
+        h.update(f"|{etag}|{last_modified}".encode("utf-8"))
+    else:
+        h.update(hashlib.sha256(content).digest())
+    return h.hexdigest()[:32]
+
+
+def _unzip_text(content):
+    with zipfile.ZipFile(BytesIO(content)) as z:
+        return z.read(z.namelist()[0]).decode("utf-8", errors="replace")
+
+
+def _cached_kf_frame(url, parse, label):
+    """Return the parsed Ken French file at url, served from the parquet cache in CACHE_DIR when possible.
+
+    Fresh entries (younger than CACHE_TTL_HOURS) are loaded without touching the network. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since; a 304 keeps the cached frame. With OFFLINE set, only
+    the cache is used and a missing entry is an error.
+    """
+    entry = _load_cache_entry(url)
+    path = os.path.join(CACHE_DIR, entry["file"] + ".parquet") if entry else None
+    cached = _read_parquet_if_exists(path) if path else None  # read once: a parallel stage may replace it
+    if cached is not None and (OFFLINE or time.time() - entry["fetched"] < CACHE_TTL_HOURS * 3600):
+        print(f"Loading {label} from cache...")
+        return cached
+    if OFFLINE:
+        raise RuntimeError(f"Offline mode (Q2_OFFLINE=1) and no cached copy of {url} in {CACHE_DIR}")
+    print(f"Downloading {label}...")
+    headers = {}
+    if cached is not None and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if cached is not None and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    r = http_get(url, headers=headers)
+    if cached is not None and r.status_code == 304:
+        _save_cache_entry(url, {**entry, "fetched": time.time()})
+        return cached
+    r.raise_for_status()
+    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    key = _cache_key(url, etag, last_modified, r.content)
+    df = parse(_unzip_text(r.content))
+    new_path = os.path.join(CACHE_DIR, key + ".parquet")
+    _write_parquet_atomic(df, new_path)
+    if cached is not None and new_path != path:
+        _report_kf_revision(label, cached, df)
+        try:
+            os.remove(path)
+        except FileNotFoundError:  # another stage saw the same release and removed it first
+            pass
+    _save_cache_entry(url, {"file": key, "etag": etag, "last_modified": last_modified, "fetched": time.time()})
+    return df
+
+
+# One run of consecutive data rows in a Ken French CSV: a YYYY, YYYYMM or YYYYMMDD date, then values.
+_KF_BLOCK_RE = re.compile(r"(?m)(?:^[ \t]*\d{4}(?:\d{2}){0,2}[ \t]*,[^\r\n]*(?:\r?\n|\Z))+")
+_KF_FREQS = {4: "A", 6: "M", 8: "D"}
+_KF_MISSING = (-99.99, -999.0)
+
+KFSection = namedtuple("KFSection", ["title", "freq", "frame"])
+
+
+def _kf_dates(d, freq):
+    """Integer YYYY / YYYYMM / YYYYMMDD dates -> DatetimeIndex (year-end / month-end / day) without string parsing."""
+    if freq == "D":
+        months = np.asarray(d // 10000 - 1970, "datetime64[Y]").astype("datetime64[M]") + (d // 100 % 100 - 1)
+        return pd.DatetimeIndex(months.astype("datetime64[D]") + (d % 100 - 1), name="Date")
+    if freq == "M":
+        periods = pd.PeriodIndex.from_ordinals((d // 100 - 1970) * 12 + d % 100 - 1, freq="M")
+    else:
+        periods = pd.PeriodIndex.from_ordinals(d - 1970, freq="Y")
+    return periods.to_timestamp(how="end").normalize().rename("Date")
+
+
+def parse_kf_sections(raw):
+    """Split a Ken French CSV into all of its data sections in one pass.
+
+    Returns a list of KFSection(title, freq, frame) in file order. title is the text line directly above the
+    column header (e.g. "Average Value Weighted Returns -- Monthly", "" if none), freq is "M", "A" or "D" from
+    the date width, and frame holds the raw values (percent, not divided by 100) with -99.99/-999 as NaN and a
+    DatetimeIndex named Date (month-end for monthly, year-end for annual).
+    """
+    sections = []
+    prev_end = 0
+    for m in _KF_BLOCK_RE.finditer(raw):
+        gap = raw[prev_end:m.start()].splitlines()
+        prev_end = m.end()
+        header = gap.pop().split(",")[1:] if gap and gap[-1].lstrip().startswith(",") else []
+        title = gap[-1].strip() if gap else ""
+        block = m.group(0)
+        freq = _KF_FREQS[len(block[: block.index(",")].strip())]
+        ncols = block.split("\n", 1)[0].count(",")
+        names = [c.strip() for c in header[:ncols]]
+        names += [f"col{i}" for i in range(len(names) + 1, ncols + 1)]
+        arr = pd.read_csv(
+            StringIO(block), header=None, usecols=range(ncols + 1), dtype="float64", skipinitialspace=True,
+        ).to_numpy()
+        values = np.where(np.isin(arr[:, 1:], _KF_MISSING), np.nan, arr[:, 1:])
+        values = pd.DataFrame(values, index=_kf_dates(arr[:, 0].astype(np.int64), freq), columns=names)
+        sections.append(KFSection(title, freq, values))
+    return sections
+
+
+def _kf_section(sections, freq="M", contains=()):
+    """First section with the given frequency whose title contains every string in `contains`."""
+    for sec in sections:
+        if sec.freq == freq and all(c in sec.title for c in contains):
+            return sec.frame
+    raise ValueError(f"No {freq} section matching {contains!r} in Ken French file")
+
+
+def _report_kf_revision(label, old, new):
+    """Log whether a new Ken French release only appends months or also revises the last stored year."""
+    window = old.tail(12)
+    added = int((new.index > old.index.max()).sum())
+    overlap = new.reindex(index=window.index, columns=window.columns)
+    if _frame_checksum(overlap) == _frame_checksum(window):
+        print(f"  {label}: new release appends {added} month(s); stored history unchanged")
+    else:
+        print(f"  {label}: new release revises stored history (and adds {added} month(s)); stored frame replaced")
+
+
+def _parse_umd(raw):
+    df = _kf_section(parse_kf_sections(raw)).iloc[:, :1] / 100
+    df.columns = ["UMD"]
+    return df.dropna()
+
+
+def _parse_ff5(raw):
+    df = _kf_section(parse_kf_sections(raw)) / 100
+    return df[["Mkt-RF", "SMB", "HML", "RMW", "CMA", "RF"]].dropna()
+
+
+def _parse_deciles(raw):
+    sections = parse_kf_sections(raw)
+    vw = _kf_section(sections, "M", ("Value Weight", "Returns")).iloc[:, :10] / 100
+    ew = _kf_section(sections, "M", ("Equal Weight", "Returns")).iloc[:, :10] / 100
+    vw.columns = [f"VW_D{i}" for i in range(1, 11)]
+    ew.columns = [f"EW_D{i}" for i in range(1, 11)]
+    return vw.join(ew).resample("ME").last()
+
+
 def download_umd_factor(url=None):
     """Download Fama-French momentum factor (UMD). Returns DataFrame with UMD column, month-end index."""
-    url = url or URL_UMD
-    print("Downloading Fama-French Momentum Factor...")
-    r = requests.get(url, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    with zipfile.ZipFile(BytesIO(r.content)) as z:
-        raw = z.read(z.namelist()[0]).decode("utf-8", errors="replace")
-    lines = raw.split("\n")
-    start = 0
-    for i, line in enumerate(lines):
-        parts = line.split(",")
-        if parts and len(parts[0].strip()) == 6 and parts[0].strip().isdigit():
-            start = i
-            break
-    df = pd.read_csv(StringIO("\n".join(lines[start:])), header=None, names=["Date", "Mom"])
-    df = df[df["Date"].notna()].copy()
-    df = df[df["Date"].astype(str).str.strip().str.len() == 6].copy()
-    df["Date"] = pd.to_datetime(df["Date"].astype(str), format="%Y%m")
-    df["UMD"] = pd.to_numeric(df["Mom"], errors="coerce") / 100
-    df = df.set_index("Date")[["UMD"]].dropna()
-    df.index = df.index.to_period("M").to_timestamp(how="end").normalize()
-    df = df[~df["UMD"].isna()].dropna()
+    df = _cached_kf_frame(url or URL_UMD, _parse_umd, "Fama-French Momentum Factor")
     print(f"  UMD: {df.index.min().strftime('%Y-%m')} to {df.index.max().strftime('%Y-%m')}, n={len(df)}")
     return df
 
 
 def download_ff5_monthly(url=None):
     """Download Fama-French 5 factors (monthly). Returns DataFrame with Mkt-RF, SMB, HML, RMW, CMA, RF."""
-    url = url or URL_FF5
-    print("Downloading Fama-French 5 factors...")
-    r = requests.get(url, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    with zipfile.ZipFile(BytesIO(r.content)) as z:
-        raw = z.read(z.namelist()[0]).decode("utf-8", errors="replace")
-    lines = raw.split("\n")
-    start = 0
-    for i, line in enumerate(lines):
-        parts = line.split(",")
-        if parts and len(parts[0].strip()) == 6 and parts[0].strip().isdigit():
-            start = i
-            break
-    df = pd.read_csv(
-        StringIO("\n".join(lines[start:])),
-        header=None,
-        names=["Date", "Mkt-RF", "SMB", "HML", "RMW", "CMA", "RF"],
-    )
-    df = df[df["Date"].notna()].copy()
-    df = df[df["Date"].astype(str).str.strip().str.len() == 6].copy()
-    df["Date"] = pd.to_datetime(df["Date"].astype(str), format="%Y%m")
-    df = df.set_index("Date")
-    for c in df.columns:
-        df[c] = pd.to_numeric(df[c], errors="coerce") / 100
-    df.index = df.index.to_period("M").to_timestamp(how="end").normalize()
-    df = df.dropna()
+    df = _cached_kf_frame(url or URL_FF5, _parse_ff5, "Fama-French 5 factors")
     print(f"  FF5: {df.index.min().strftime('%Y-%m')} to {df.index.max().strftime('%Y-%m')}")
     return df
 
 
 def download_momentum_deciles(url=None):
     """Download 10 portfolios (Prior 12-2) from Ken French. Returns DataFrame with VW_D1..VW_D10, EW_D1..EW_D10."""
-    url = url or URL_DECILES
-    print("Downloading momentum decile portfolios (Prior 12-2)...")
-    r = requests.get(url, timeout=REQUEST_TIMEOUT)
-    r.raise_for_status()
-    with zipfile.ZipFile(BytesIO(r.content)) as z:
-        raw = z.read(z.namelist()[0]).decode("utf-8", errors="replace")
-    lines = raw.split("\n")
-    vw_start = ew_start = None
-    for i, line in enumerate(lines):
-        if "Value Weight" in line and "Returns" in line and "Monthly" in line:
-            vw_start = i + 1
-        if "Equal Weight" in line and "Returns" in line and "Monthly" in line:
-            ew_start = i + 1
-    if vw_start is None or ew_start is None:
-        for i, line in enumerate(lines):
-            p = line.split(",")
-            if p and len(p[0].strip()) == 6 and p[0].strip().isdigit():
-                vw_start = i
-                break
-        monthly_lines = [l for l in lines[vw_start:] if l.strip() and len(l.split(",")[0].strip()) == 6]
-        arr = []
-        for l in monthly_lines:
-            parts = [x.strip() for x in l.split(",")]
-            if len(parts) >= 20:
-                arr.append(parts[:20])
-            elif len(parts) >= 10:
-                arr.append(parts[:10] + [np.nan] * 10)
-        if not arr:
-            raise ValueError("Could not parse decile file")
-        df = pd.DataFrame(arr)
-        df.columns = ["Date"] + [f"VW_D{i}" for i in range(1, 11)] + [f"EW_D{i}" for i in range(1, 11)]
-        df["Date"] = pd.to_datetime(df["Date"], format="%Y%m")
-        for c in df.columns:
-            if c != "Date":
-                df[c] = pd.to_numeric(df[c], errors="coerce") / 100
-        df = df.set_index("Date").resample("ME").last()
-        print(f"  Deciles: {df.index.min().strftime('%Y-%m')} to {df.index.max().strftime('%Y-%m')}")
-        return df
-
-    def parse_section(from_line, ncols=10, prefix=""):
-        rows = []
-        for line in lines[from_line:]:
-            parts = [x.strip() for x in line.split(",")]
-            if not parts or len(parts[0]) != 6 or not parts[0].isdigit():
-                if rows:
-                    break
-                continue
-            if len(parts) >= ncols + 1:
-                rows.append(parts[: ncols + 1])
-        if not rows:
-            return None
-        d = pd.DataFrame(rows)
-        d.columns = ["Date"] + [f"{prefix}D{i}" for i in range(1, ncols + 1)]
-        d["Date"] = pd.to_datetime(d["Date"], format="%Y%m")
-        for c in d.columns:
-            if c != "Date":
-                d[c] = pd.to_numeric(d[c], errors="coerce") / 100
-        return d.set_index("Date")
-
-    vw_df = parse_section(vw_start, 10, "VW_")
-    ew_df = parse_section(ew_start, 10, "EW_")
-    if vw_df is not None and ew_df is not None:
-        df = vw_df.join(ew_df)
-    else:
-        monthly_lines = [l for l in lines[12:] if l.strip()]
-        parsed = []
-        for l in monthly_lines:
-            p = [x.strip() for x in l.split(",")]
-            if len(p) >= 21 and len(p[0]) == 6 and p[0].isdigit():
-                parsed.append(p[:21])
-        df = pd.DataFrame(parsed)
-        df.columns = ["Date"] + [f"VW_D{i}" for i in range(1, 11)] + [f"EW_D{i}" for i in range(1, 11)]
-        df["Date"] = pd.to_datetime(df["Date"], format="%Y%m")
-        for c in df.columns:
-            if c != "Date":
-                df[c] = pd.to_numeric(df[c], errors="coerce") / 100
-        df = df.set_index("Date")
-    df = df.resample("ME").last()
+    df = _cached_kf_frame(url or URL_DECILES, _parse_deciles, "momentum decile portfolios (Prior 12-2)")
     print(f"  Deciles: {df.index.min().strftime('%Y-%m')} to {df.index.max().strftime('%Y-%m')}")
     return df
 
 
+def _to_month_periods(obj):
+    """Same data re-indexed by monthly Period (timezone dropped), for alignment by year-month."""
+    idx = obj.index
+    if not isinstance(idx, pd.PeriodIndex):
+        idx = pd.DatetimeIndex(idx)
+        if idx.tz is not None:
+            idx = idx.tz_localize(None)
+        idx = idx.to_period("M")
+    return obj.set_axis(idx.rename("Date"))
+
+
 def merge_on_ym(left_series, right_df, left_name="left"):
     """Align left_series (Series with DatetimeIndex) and right_df (DataFrame with Date index) by year-month. Returns DataFrame with left_name column and right_df columns."""
-    if left_series.index.tz is not None:
-        left_series = left_series.tz_localize(None)
-    left_df = left_series.reset_index()
-    left_df.columns = ["Date", left_name]
-    left_df["ym"] = left_df["Date"].dt.to_period("M")
-    right_reset = right_df.reset_index()
-    right_reset["ym"] = right_reset["Date"].dt.to_period("M")
-    merged = left_df.merge(right_reset.drop(columns=["Date"]), on="ym", how="inner")
-    return merged.set_index("Date")
+    left = _to_month_periods(left_series.rename(left_name))
+    right = _to_month_periods(right_df)
+    keep = left.index.isin(right.index)
+    merged = left[keep].to_frame().join(right)
+    merged.index = left_series.index[keep]
+    return merged
+
+
+class FactorPanel:
+    """Monthly FF5 + UMD factors and any number of asset return series on one PeriodIndex.
+
+    Values live in a single float64 array laid out as const, Mkt-RF, SMB, HML, RMW, CMA, UMD, RF, then the assets,
+    so a run of adjacent columns (e.g. FF6 with intercept) is a zero-copy NumPy view. Assets are aligned to the
+    factor months by reindexing; with dropna=True only months where every asset has a return are kept.
+    """
+
+    FACTORS = ["Mkt-RF", "SMB", "HML", "RMW", "CMA", "UMD", "RF"]
+    FF6 = ["const", "Mkt-RF", "SMB", "HML", "RMW", "CMA", "UMD"]
+    CAPM = ["const", "Mkt-RF"]
+
+    def __init__(self, ff5, umd, assets=None, dropna=False):
+        factors = _to_month_periods(ff5).join(_to_month_periods(umd)[["UMD"]], how="inner")[self.FACTORS]
+        if isinstance(assets, pd.Series):
+            assets = {assets.name: assets}
+        elif isinstance(assets, pd.DataFrame):
+            assets = {c: assets[c] for c in assets.columns}
+        assets = assets or {}
+        names = list(assets)
+        values = np.empty((len(factors), 1 + len(self.FACTORS) + len(names)))
+        values[:, 0] = 1.0
+        values[:, 1:1 + len(self.FACTORS)] = factors.to_numpy(dtype="float64")
+        for j, name in enumerate(names, 1 + len(self.FACTORS)):
+            values[:, j] = _to_month_periods(assets[name]).reindex(factors.index).to_numpy(dtype="float64")
+        if dropna and names:
+            keep = ~np.isnan(values[:, 1 + len(self.FACTORS):]).any(axis=1)
+            values, factors = values[keep], factors[keep]
+        self.index = factors.index
+        self.columns = ["const"] + self.FACTORS + names
+        self.assets = names
+        self.values = values
+        self._pos = {c: i for i, c in enumerate(self.columns)}
+        self.frame = pd.DataFrame(values, index=self.index, columns=self.columns, copy=False)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def dates(self):
+        """Month-end DatetimeIndex matching the rows (for plotting and CSV output)."""
+        return self.index.to_timestamp(how="end").normalize()
+
+    def view(self, cols):
+        """NumPy array of the given columns: a view if they are adjacent and in panel order, else a copy."""
+        pos = [self._pos[c] for c in cols]
+        if pos == list(range(pos[0], pos[0] + len(pos))):
+            return self.values[:, pos[0]:pos[0] + len(pos)]
+        return self.values[:, pos]
+
+    def valid(self, cols):
+        """Boolean row mask: months where all of cols are present."""
+        return ~np.isnan(self.view(cols)).any(axis=1)
+
+    def excess(self, asset):
+        """Asset return minus RF, as a Series on the panel index."""
+        return pd.Series(self.values[:, self._pos[asset]] - self.values[:, self._pos["RF"]],
+                         index=self.index, name=f"{asset}_excess")
+
+    def to_frame(self, cols):
+        """Copy of the given columns indexed by month-end timestamps."""
+        return pd.DataFrame(self.view(cols), index=self.dates, columns=cols)
 
 
 def load_q1_merged(path=None):
@@ -210,3 +507,46 @@ def load_q1_merged(path=None):
     spmo = df["SPMO"]
     umd = df[["UMD"]]
     return df, spmo, umd
+
+
+class Q2Data:
+    """Inputs shared by the Q2 scripts, loaded lazily and at most once per instance.
+
+    Standalone, each script builds its own instance. q2_run_all.py --in-process passes one instance through every
+    script's main(ctx), so downloads and cache reads happen once per pipeline run.
+    """
+
+    @cached_property
+    def spmo(self):
+        return download_spmo_monthly(ticker=SPMO_TICKER)
+
+    @cached_property
+    def umd(self):
+        return download_umd_factor()
+
+    @cached_property
+    def ff5(self):
+        return download_ff5_monthly()
+
+    @cached_property
+    def deciles(self):
+        return download_momentum_deciles()
+
+    @cached_property
+    def other_etfs(self):
+        return download_etf_monthly([t for t, _ in OTHER_ETF_TICKERS])
+
+    @cached_property
+    def q1_merged(self):
+        """SPMO and UMD over the Q2.1 sample: set in memory by q2_1, else read from its CSV, else None."""
+        loaded = load_q1_merged()
+        if loaded is None:
+            return None
+        print("Using SPMO and UMD from q2_1_spmo_umd_data.csv")
+        return loaded[0]
+
+    def spmo_umd(self):
+        """(SPMO returns, UMD frame) for the steps after Q2.1: its sample if available, else full downloads."""
+        if self.q1_merged is not None:
+            return self.q1_merged["SPMO"], self.q1_merged[["UMD"]]
+        return self.spmo, self.umd
@@ -7,12 +7,57 @@ from datetime import datetime
 Q2_DIR = os.path.dirname(os.path.abspath(__file__))
 OUT_DIR = Q2_DIR
 os.makedirs(OUT_DIR, exist_ok=True)
+# Typed results store (q2_store.py): every run of a stage appends full-precision parquet parts here
+RESULTS_DIR = os.path.join(OUT_DIR, "results")
 
 # ---------------------------------------------------------------------------
 # Sample period (used for SPMO and other ETFs)
 # ---------------------------------------------------------------------------
 START_DATE = "2015-10-01"
-END_DATE = datetime.now().strftime("%Y-%m-%d")  # today, or set e.g. "2025-12-31"
+END_DATE = os.environ.get("Q2_END_DATE") or datetime.now().strftime("%Y-%m-%d")  # today, or set e.g. "2025-12-31"
+
+# ---------------------------------------------------------------------------
+# Regression inference
+# ---------------------------------------------------------------------------
+# Standard errors for the factor regressions: "nonrobust" (default), "HC0"-"HC3", or "HAC" (Newey-West); opt in
+# with e.g. Q2_COV_TYPE=HAC. With HAC_MAXLAGS = None the lag length is floor(4 (n/100)^(2/9)) for each
+# regression's sample size n.
+COV_TYPE = os.environ.get("Q2_COV_TYPE") or "nonrobust"
+HAC_MAXLAGS = None
+
+# ---------------------------------------------------------------------------
+# Block bootstrap (Q2.1)
+# ---------------------------------------------------------------------------
+# Intervals for alpha / beta / R²: resamples, "stationary" or "moving" blocks,
+# block length in months (None = n^(1/3)), seed, worker processes (None = in-process unless the job is large)
+BOOTSTRAP_RESAMPLES = 10000
+BOOTSTRAP_METHOD = "stationary"
+BOOTSTRAP_BLOCK = None
+BOOTSTRAP_SEED = 7037
+BOOTSTRAP_WORKERS = None
+
+# ---------------------------------------------------------------------------
+# Asset-pricing tests on the momentum deciles (Q2.3)
+# ---------------------------------------------------------------------------
+# Fama-MacBeth: factors priced in the cross-section of the 20 VW/EW deciles
+FAMA_MACBETH_FACTORS = ["Mkt-RF", "UMD"]
+# Trailing window (months) for the rolling GRS test of the deciles' joint alpha (needs > 20 + factors months)
+GRS_WINDOW_MONTHS = 60
+
+# ---------------------------------------------------------------------------
+# Rolling regressions
+# ---------------------------------------------------------------------------
+# Trailing window (months) for rolling factor betas; expanding-window betas start from the first month
+ROLLING_WINDOW_MONTHS = 36
+
+# ---------------------------------------------------------------------------
+# Figures
+# ---------------------------------------------------------------------------
+# Drawn by PLOT_WORKERS background processes while the scripts keep computing (0 = draw in the
+# calling process); a PNG is redrawn only when its input data changed. Line series longer than PLOT_MAX_POINTS
+# (e.g. daily data) are decimated to each bucket's min / max before plotting.
+PLOT_WORKERS = 2
+PLOT_MAX_POINTS = 2000
 
 # ---------------------------------------------------------------------------
 # Tickers
@@ -25,6 +70,24 @@ OTHER_ETF_TICKERS = [
     ("QMOM", "Alpha Architect US Quantitative Momentum ETF"),
 ]
 
+# ---------------------------------------------------------------------------
+# Q2.5 universe scan
+# ---------------------------------------------------------------------------
+# python q2_5_other_etfs.py --universe FILE: tickers per download/fit task, worker
+# processes (None = all CPUs), minimum months of returns for a loading estimate. Finished chunks are written
+# to UNIVERSE_PARTS_DIR as they complete, so a killed scan resumes with the tickers not yet done.
+UNIVERSE_CHUNK_SIZE = 50
+UNIVERSE_WORKERS = None
+UNIVERSE_MIN_MONTHS = 24
+UNIVERSE_PARTS_DIR = os.path.join(OUT_DIR, "q2_5_universe_parts")
+
+# ---------------------------------------------------------------------------
+# Price source
+# ---------------------------------------------------------------------------
+# Daily price source for ETF downloads: None = Yahoo Finance, or a path to a local wide file of
+# daily closes (CSV or parquet; date index, one column per ticker), e.g. for offline runs and tests.
+PRICE_FILE = os.environ.get("Q2_PRICE_FILE") or None
+
 # ---------------------------------------------------------------------------
 # Ken French data URLs
 # ---------------------------------------------------------------------------
@@ -37,6 +100,29 @@ URL_DECILES = "https://mba.tuck.dartmouth.edu/pages/faculty/ken.french/ftp/10_Po
 # ---------------------------------------------------------------------------
 REQUEST_TIMEOUT = 30
 
+# ---------------------------------------------------------------------------
+# Local cache for Ken French downloads (parsed frames stored as parquet)
+# ---------------------------------------------------------------------------
+CACHE_DIR = os.path.join(Q2_DIR, ".cache")
+CACHE_TTL_HOURS = 24  # after this, revalidate with the server (ETag / Last-Modified)
+OFFLINE = os.environ.get("Q2_OFFLINE", "") == "1"  # never touch the network; cache only
+
+# Record / replay of network responses (Ken French and Yahoo), for reproducible offline timing runs:
+#   live   - normal network access (default)
+#   record - normal network access; every response is also saved under FIXTURE_DIR
+#   replay - no network; responses are served from FIXTURE_DIR and a missing fixture is an error
+# Yahoo fixtures are keyed on tickers and dates, so replay with the Q2_END_DATE used when recording.
+DATA_MODE = os.environ.get("Q2_DATA_MODE", "live")
+if DATA_MODE not in ("live", "record", "replay"):
+    raise ValueError(f"Q2_DATA_MODE must be live, record or replay, not {DATA_MODE!r}")
+FIXTURE_DIR = os.environ.get("Q2_FIXTURE_DIR") or os.path.join(Q2_DIR, "fixtures")
+
+# Append-only store of daily ETF closes (one parquet per ticker). A refresh re-fetches only the last
+# REFRESH_OVERLAP_MONTHS stored months plus anything newer; if the re-fetched overlap no longer matches
+# the stored bars (e.g. dividend re-adjustment), that ticker's full history is rebuilt.
+PRICE_CACHE_DIR = os.path.join(CACHE_DIR, "prices")
+REFRESH_OVERLAP_MONTHS = 1
+
 # ---------------------------------------------------------------------------
 # Data cleaning: monthly return bounds (drop if outside)
 # ---------------------------------------------------------------------------
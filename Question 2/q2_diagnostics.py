@@ -0,0 +1,77 @@
+"""Residual diagnostics (Jarque-Bera, Breusch-Pagan, Durbin-Watson) for many regressions at once.
+
+Statistics come straight from residuals already held by a fit (model.resid, or batch_residuals for an
+q2_ols batch), one column per model, with NaN marking months outside a model's sample. Every statistic is a
+column-wise NumPy reduction, and the Breusch-Pagan auxiliary regressions are one ols_many batch, so the cost
+of diagnosing a thousand models is a few array passes. Results match scipy / statsmodels.
+"""
+import numpy as np
+import pandas as pd
+
+from q2_ols import _as_frame, ols_many
+
+DIAGNOSTIC_COLUMNS = ["jb", "jb_pvalue", "skew", "kurtosis", "bp_lm", "bp_pvalue", "dw", "nobs"]
+
+
+def batch_residuals(Y, X, params):
+    """Residuals Y - X @ params for every column of Y (params: k x m frame, e.g. ols_many(...).params)."""
+    Y = _as_frame(Y, "y")
+    X = X.loc[Y.index] if isinstance(X, pd.DataFrame) else pd.DataFrame(np.asarray(X), index=Y.index)
+    b = params.reindex(index=X.columns, columns=Y.columns).to_numpy(dtype="float64")
+    return pd.DataFrame(Y.to_numpy(dtype="float64") - X.to_numpy(dtype="float64") @ b,
+                        index=Y.index, columns=Y.columns)
+
+
+def jarque_bera_many(E):
+    """(jb, pvalue, skew, kurtosis) per column of a residual array with NaN for missing rows (as scipy.stats.jarque_bera)."""
+    from scipy import stats
+
+    n = np.sum(~np.isnan(E), axis=0).astype("float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = E - np.nansum(E, axis=0) / n
+        m2, m3, m4 = (np.nansum(d ** p, axis=0) / n for p in (2, 3, 4))
+        skew = m3 / m2 ** 1.5
+        kurt = m4 / m2 ** 2
+    jb = n / 6 * (skew ** 2 + (kurt - 3) ** 2 / 4)
+    return jb, stats.chi2.sf(jb, 2), skew, kurt
+
+
+def durbin_watson_many(E):
+    """Durbin-Watson per column over each column's non-missing rows (gaps are skipped, as after dropna)."""
+    E = pd.DataFrame(E)
+    prev = E.ffill().shift(1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (np.nansum((E - prev).to_numpy() ** 2, axis=0)
+                / np.nansum(E.to_numpy() ** 2, axis=0))
+
+
+def breusch_pagan_many(E, X):
+    """Koenker (studentized) Breusch-Pagan LM and p-value per column: nobs * R² of e² on X, chi² with k - 1 df.
+
+    X must include the constant; the auxiliary regressions run as one ols_many batch on each column's sample.
+    """
+    from scipy import stats
+
+    aux = ols_many(pd.DataFrame(np.asarray(E) ** 2, index=X.index), X)
+    lm = (aux.nobs * aux.rsquared).to_numpy(dtype="float64")
+    return lm, stats.chi2.sf(lm, X.shape[1] - 1)
+
+
+def residual_diagnostics(resid, X=None):
+    """Diagnostics table (one row per residual column): JB, skew, kurtosis, BP (needs the design X), DW, nobs.
+
+    resid: Series or (months x models) frame, NaN outside each model's sample; X: the design with constant,
+    on the same index. Models fitted on different designs can be diagnosed together only without X.
+    """
+    resid = _as_frame(resid, "resid")
+    E = resid.to_numpy(dtype="float64")
+    jb, jb_p, skew, kurt = jarque_bera_many(E)
+    out = pd.DataFrame({"jb": jb, "jb_pvalue": jb_p, "skew": skew, "kurtosis": kurt}, index=resid.columns)
+    if X is not None:
+        X = X.loc[resid.index] if isinstance(X, pd.DataFrame) else pd.DataFrame(np.asarray(X), index=resid.index)
+        out["bp_lm"], out["bp_pvalue"] = breusch_pagan_many(E, X)
+    else:
+        out["bp_lm"] = out["bp_pvalue"] = np.nan
+    out["dw"] = durbin_watson_many(E)
+    out["nobs"] = np.sum(~np.isnan(E), axis=0)
+    return out[DIAGNOSTIC_COLUMNS]
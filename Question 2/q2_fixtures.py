@@ -0,0 +1,111 @@
+"""Record / replay of network responses (Ken French, FRED and Yahoo), shared by Question 2 and Question 3.
+
+A FixtureStore runs in one of three modes: "live" fetches normally, "record" also saves every response under
+its fixture directory, "replay" serves the saved responses without touching the network (a missing one is an
+error). HTTP responses are saved as the body plus a small JSON file with the status and cache validators;
+yfinance has no pluggable HTTP layer, so whole downloaded frames are pickled instead. Only the standard
+library is needed at import time (requests, yfinance and pandas are imported on first use).
+"""
+import hashlib
+import json
+import os
+import time
+
+MODES = ("live", "record", "replay")
+
+
+class FixtureResponse:
+    """Recorded HTTP response served in replay mode (the subset of requests.Response used here)."""
+
+    def __init__(self, url, status_code, headers, content):
+        from requests.structures import CaseInsensitiveDict
+
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+
+            raise requests.HTTPError(f"{self.status_code} (recorded fixture) for url: {self.url}", response=self)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class FixtureStore:
+    """http_get / yf_download honouring a record-replay mode; mode_var names the setting in error messages."""
+
+    def __init__(self, mode, fixture_dir, mode_var):
+        if mode not in MODES:
+            raise ValueError(f"{mode_var} must be live, record or replay, not {mode!r}")
+        self.mode = mode
+        self.fixture_dir = str(fixture_dir)
+        self.mode_var = mode_var
+
+    def path(self, kind, key, ext):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.fixture_dir, kind, f"{name}.{ext}")
+
+    def http_get(self, url, headers=None, timeout=30, session=None):
+        """session.get (default: requests.get); record saves each 200 response, replay serves it back.
+
+        In replay, a conditional request whose If-None-Match / If-Modified-Since matches the recorded validators
+        gets a 304, as the server would answer.
+        """
+        headers = headers or {}
+        body_path = self.path("http", url, "bin")
+        meta_path = body_path[:-4] + ".json"
+        if self.mode == "replay":
+            if not os.path.isfile(meta_path):
+                raise RuntimeError(
+                    f"Replay mode ({self.mode_var}=replay) and no recorded response for {url} in {self.fixture_dir}")
+            with open(meta_path) as f:
+                meta = json.load(f)
+            etag, last_modified = meta["headers"].get("ETag"), meta["headers"].get("Last-Modified")
+            if (etag and headers.get("If-None-Match") == etag) or (
+                    last_modified and headers.get("If-Modified-Since") == last_modified):
+                return FixtureResponse(url, 304, meta["headers"], b"")
+            with open(body_path, "rb") as f:
+                return FixtureResponse(url, meta["status_code"], meta["headers"], f.read())
+        if session is None:
+            import requests
+
+            session = requests
+        r = session.get(url, headers=headers, timeout=timeout)
+        if self.mode == "record" and r.status_code == 200:
+            keep = {k: r.headers[k] for k in ("ETag", "Last-Modified", "Content-Type") if k in r.headers}
+            _write_atomic(body_path, r.content)
+            meta = {"url": url, "status_code": r.status_code, "headers": keep, "recorded": time.time()}
+            _write_atomic(meta_path, json.dumps(meta, indent=1).encode("utf-8"))
+        return r
+
+    def yf_download(self, tickers, **kwargs):
+        """yf.download(tickers, **kwargs); the whole frame is recorded, keyed on the tickers and arguments."""
+        import pandas as pd
+
+        key = json.dumps({"tickers": tickers, **kwargs}, sort_keys=True, default=str)
+        path = self.path("yahoo", key, "pkl")
+        if self.mode == "replay":
+            if not os.path.isfile(path):
+                raise RuntimeError(f"Replay mode ({self.mode_var}=replay) and no recorded Yahoo download for {key}")
+            return pd.read_pickle(path)
+        import yfinance as yf
+
+        data = yf.download(tickers, **kwargs)
+        if self.mode == "record":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data.to_pickle(f"{path}.{os.getpid()}.tmp")
+            os.replace(f"{path}.{os.getpid()}.tmp", path)
+        return data
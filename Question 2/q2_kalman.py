@@ -0,0 +1,124 @@
+"""Time-varying factor betas from a state-space regression (Kalman filter, RTS smoother, MLE noise variances).
+
+    y_t = x_t' b_t + e_t,      e_t ~ N(0, s2)
+    b_t = b_{t-1} + w_t,       w_t ~ N(0, diag(q))
+
+Every coefficient follows a random walk except the `static` ones (e.g. the intercept), whose q is 0. The filter
+is one O(k²) update per observation, so monthly and daily samples alike take one pass. Noise variances are
+estimated by maximizing the Gaussian likelihood with s2 concentrated out, i.e. over q / s2 only. The initial
+state is diffuse; the first k observations only initialize it and are left out of the likelihood.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+DIFFUSE_VARIANCE = 1e7    # initial state variance (relative to s2)
+LOG_RATIO_BOUNDS = (-30.0, 5.0)  # search range for log(q / s2); the lower end is a static beta in practice
+LOG_RATIO_STARTS = (-12.0, -8.0, -4.0)  # starting grid per random-walk coefficient
+
+KalmanBeta = namedtuple("KalmanBeta", ["smoothed", "filtered", "params", "loglik", "nobs"])
+
+
+def _filter(y, X, ratio):
+    """Kalman filter with s2 = 1 and state noise diag(ratio). Returns predicted/filtered moments and v, F."""
+    n, k = X.shape
+    Q = np.diag(ratio)
+    b = np.zeros(k)
+    P = np.eye(k) * DIFFUSE_VARIANCE
+    b_pred, P_pred = np.empty((n, k)), np.empty((n, k, k))
+    b_filt, P_filt = np.empty((n, k)), np.empty((n, k, k))
+    v, F = np.empty(n), np.empty(n)
+    for t in range(n):
+        x = X[t]
+        b_pred[t], P_pred[t] = b, P
+        Px = P @ x
+        F[t] = x @ Px + 1.0
+        v[t] = y[t] - x @ b
+        K = Px / F[t]
+        b = b + K * v[t]
+        P = P - np.outer(K, Px)
+        P = 0.5 * (P + P.T)
+        b_filt[t], P_filt[t] = b, P
+        P = P + Q
+    return b_pred, P_pred, b_filt, P_filt, v, F
+
+
+def _profile_loglik(v, F, d):
+    """Log-likelihood with s2 concentrated out (first d observations excluded), and the s2 estimate."""
+    v, F = v[d:], F[d:]
+    m = len(v)
+    s2 = np.sum(v * v / F) / m
+    return -0.5 * (m * (np.log(2 * np.pi) + np.log(s2) + 1) + np.sum(np.log(F))), s2
+
+
+def _smooth(b_pred, P_pred, b_filt, P_filt):
+    """Rauch-Tung-Striebel smoother for a random-walk state."""
+    n = len(b_filt)
+    b_s, P_s = b_filt.copy(), P_filt.copy()
+    for t in range(n - 2, -1, -1):
+        J = np.linalg.solve(P_pred[t + 1], P_filt[t]).T  # P_filt[t] @ inv(P_pred[t+1]); both symmetric
+        b_s[t] = b_filt[t] + J @ (b_s[t + 1] - b_pred[t + 1])
+        P_s[t] = P_filt[t] + J @ (P_s[t + 1] - P_pred[t + 1]) @ J.T
+    return b_s, P_s
+
+
+def _bands(b, P, names, index, s2, level):
+    """Frame of each coefficient path with its level-% band (columns <name>, <name>_low, <name>_high)."""
+    from scipy import stats
+
+    se = np.sqrt(np.maximum(np.diagonal(P, axis1=1, axis2=2), 0) * s2)
+    z = stats.norm.ppf(0.5 + level / 2)
+    out = {}
+    for j, name in enumerate(names):
+        out[name] = b[:, j]
+        out[f"{name}_low"] = b[:, j] - z * se[:, j]
+        out[f"{name}_high"] = b[:, j] + z * se[:, j]
+    return pd.DataFrame(out, index=index)
+
+
+def kalman_beta(y, X, static=("const",), level=0.95, ratios=None):
+    """Random-walk betas of y on X (include a "const" column for an intercept; it is static by default).
+
+    ratios: fixed q / s2 per random-walk column (skips the MLE). Returns KalmanBeta with `smoothed` and
+    `filtered` frames (each coefficient and its level-% band, indexed like y), `params` (s2 and q per
+    coefficient), the log-likelihood and the number of observations used (rows with missing values dropped).
+    """
+    from scipy import optimize
+
+    X = X if isinstance(X, pd.DataFrame) else pd.DataFrame(np.asarray(X, dtype="float64"))
+    y = pd.Series(np.asarray(y, dtype="float64").reshape(-1), index=X.index)
+    ok = y.notna() & X.notna().all(axis=1)
+    yv, Xv = y[ok].to_numpy(), X[ok].to_numpy(dtype="float64")
+    names = list(X.columns)
+    n, k = Xv.shape
+    if n <= k + 1:
+        raise ValueError(f"kalman_beta needs more than {k + 1} observations, got {n}")
+    walk = np.array([c not in static for c in names])
+
+    def ratio_vector(log_ratio):
+        r = np.zeros(k)
+        r[walk] = np.exp(log_ratio)
+        return r
+
+    def negloglik(log_ratio):
+        *_, v, F = _filter(yv, Xv, ratio_vector(log_ratio))
+        return -_profile_loglik(v, F, k)[0]
+
+    if ratios is None:
+        m = int(walk.sum())
+        starts = [np.full(m, s) for s in LOG_RATIO_STARTS]
+        x0 = min(starts, key=negloglik)
+        res = optimize.minimize(negloglik, x0, method="L-BFGS-B", bounds=[LOG_RATIO_BOUNDS] * m)
+        ratio = ratio_vector(res.x)
+    else:
+        ratio = np.zeros(k)
+        ratio[walk] = np.asarray(ratios, dtype="float64")
+
+    b_pred, P_pred, b_filt, P_filt, v, F = _filter(yv, Xv, ratio)
+    loglik, s2 = _profile_loglik(v, F, k)
+    b_s, P_s = _smooth(b_pred, P_pred, b_filt, P_filt)
+    index = y.index[ok.to_numpy()]
+    params = pd.Series({"sigma2": s2, **{f"q_{c}": r * s2 for c, r in zip(names, ratio) if c not in static}})
+    return KalmanBeta(_bands(b_s, P_s, names, index, s2, level), _bands(b_filt, P_filt, names, index, s2, level),
+                      params, loglik, n)
@@ -0,0 +1,325 @@
+"""Batched OLS: many responses on one design (one QR per missing-data pattern), one response on many
+single-regressor designs (vectorized moments), and rolling / expanding windows (running X'X / X'y sums).
+Estimates, standard errors, t-stats, p-values and R² follow statsmodels' OLS conventions: centered R² when
+the design has a constant; cov_type "nonrobust" (t p-values) or "HC0"-"HC3" / "HAC" (Newey-West, Bartlett
+kernel, no small-sample correction; normal p-values)."""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+COV_TYPES = ("nonrobust", "HC0", "HC1", "HC2", "HC3", "HAC")
+
+# Each statistic is a DataFrame (terms x responses) or a Series (per response).
+OLSBatch = namedtuple(
+    "OLSBatch", ["params", "bse", "tvalues", "pvalues", "rsquared", "rsquared_adj", "nobs", "df_resid"]
+)
+
+
+def newey_west_lags(nobs):
+    """Automatic Newey-West lag length, floor(4 (n / 100)^(2/9)), for a scalar or array of sample sizes."""
+    return np.floor(4 * (np.asarray(nobs, dtype="float64") / 100) ** (2 / 9)).astype("int64")
+
+
+def statsmodels_cov(cov_type="nonrobust", nobs=None, maxlags=None):
+    """Keyword arguments for statsmodels' OLS.fit() giving the same covariance as cov_type / maxlags here."""
+    _check_cov_type(cov_type)
+    if cov_type != "HAC":
+        return {"cov_type": cov_type}
+    lags = int(newey_west_lags(nobs)) if maxlags is None else maxlags
+    return {"cov_type": "HAC", "cov_kwds": {"maxlags": lags}}
+
+
+def _check_cov_type(cov_type):
+    if cov_type not in COV_TYPES:
+        raise ValueError(f"cov_type must be one of {', '.join(COV_TYPES)}, not {cov_type!r}")
+
+
+def _as_frame(obj, prefix):
+    if isinstance(obj, pd.DataFrame):
+        return obj
+    if isinstance(obj, pd.Series):
+        return obj.to_frame(obj.name if obj.name is not None else f"{prefix}0")
+    arr = np.asarray(obj, dtype="float64")
+    arr = arr.reshape(len(arr), -1)
+    return pd.DataFrame(arr, columns=[f"{prefix}{i}" for i in range(arr.shape[1])])
+
+
+def _const_columns(X):
+    """Boolean mask of constant, nonzero design columns (statsmodels' k_constant detection)."""
+    with np.errstate(invalid="ignore"):
+        return (np.nanmax(X, axis=0) == np.nanmin(X, axis=0)) & (np.nanmax(np.abs(X), axis=0) > 0)
+
+
+def _pvalues(t, df, cov_type):
+    from scipy import stats
+
+    with np.errstate(invalid="ignore"):
+        if cov_type == "nonrobust":
+            return 2 * stats.t.sf(np.abs(t), df)
+        return 2 * stats.norm.sf(np.abs(t))
+
+
+def _robust_bse(U, bread, nobs, k, cov_type, maxlags=None, leverage=None):
+    """Sandwich standard errors for a batch of regressions, shape (batch x k).
+
+    U holds the scores x_t * e_t as (rows x batch x k), with zeros for rows a regression does not use;
+    bread is (X'X)^-1 per regression (batch x k x k); nobs is per regression. HC2 / HC3 need the leverage
+    (rows x batch). HAC lags are taken between consecutive rows of U.
+    """
+    if cov_type in ("HC2", "HC3"):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = 1 / np.sqrt(1 - leverage) if cov_type == "HC2" else 1 / (1 - leverage)
+        U = U * np.where(np.isfinite(scale), scale, 0.0)[:, :, None]
+    meat = np.einsum("tbi,tbj->bij", U, U)
+    if cov_type == "HAC":
+        lags = newey_west_lags(nobs) if maxlags is None else np.full(np.shape(nobs), maxlags)
+        for lag in range(1, int(np.max(lags, initial=0)) + 1):
+            w = np.clip(1 - lag / (lags + 1), 0.0, None)
+            g = np.einsum("tbi,tbj->bij", U[lag:], U[:-lag]) * w[:, None, None]
+            meat += g + g.transpose(0, 2, 1)
+    elif cov_type == "HC1":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            meat *= (nobs / (nobs - k))[:, None, None]
+    var = np.einsum("bai,bij,baj->ba", bread, meat, bread)
+    return np.sqrt(np.clip(var, 0.0, None))
+
+
+def _pack(names, responses, params, bse, ssr, tss, nobs, df_resid, k_const, cov_type):
+    """Assemble the OLSBatch from (k x m) params / bse and per-response sums of squares."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = params / bse
+        rsquared = 1 - ssr / tss
+        rsquared_adj = 1 - (nobs - k_const) / df_resid * (1 - rsquared)
+    frame = lambda a: pd.DataFrame(a, index=names, columns=responses)
+    series = lambda a: pd.Series(a, index=responses)
+    return OLSBatch(
+        frame(params), frame(bse), frame(t), frame(_pvalues(t, df_resid, cov_type)),
+        series(rsquared), series(rsquared_adj), series(nobs.astype("int64")), series(df_resid),
+    )
+
+
+def _solve_group(X, Y):
+    """OLS of every column of Y on X (no missing values). Returns params, (X'X)^-1, residuals, df_resid."""
+    n, k = X.shape
+    Q, R = np.linalg.qr(X)
+    d = np.abs(np.diag(R))
+    if n > k and d.min() > 1e-10 * d.max():
+        params = np.linalg.solve(R, Q.T @ Y)
+        r_inv = np.linalg.solve(R, np.eye(k))
+        xtx_inv = r_inv @ r_inv.T
+        rank = k
+    else:
+        # Rank deficient (or too few rows): minimum-norm solution via pinv, as statsmodels does.
+        pinv = np.linalg.pinv(X)
+        params = pinv @ Y
+        xtx_inv = pinv @ pinv.T
+        rank = np.linalg.matrix_rank(X)
+    return params, xtx_inv, Y - X @ params, n - rank
+
+
+def ols_many(Y, X, cov_type="nonrobust", maxlags=None):
+    """Regress every column of Y on the same design X (include a "const" column for an intercept).
+
+    Rows where the response or any regressor is missing are dropped per response. Responses sharing a
+    missing-data pattern are solved together from a single QR factorization of their rows of X, and their
+    robust covariances (cov_type) from one batched sandwich. HAC uses maxlags, or newey_west_lags(nobs).
+    """
+    _check_cov_type(cov_type)
+    Y, X = _as_frame(Y, "y"), _as_frame(X, "x")
+    names, responses = list(X.columns), list(Y.columns)
+    x = X.to_numpy(dtype="float64")
+    y = Y.to_numpy(dtype="float64")
+    n, m, k = len(x), y.shape[1], x.shape[1]
+    rows = np.isfinite(y) & np.isfinite(x).all(axis=1)[:, None]
+    k_const = int(_const_columns(x).any())
+
+    params = np.full((k, m), np.nan)
+    bse = np.full((k, m), np.nan)
+    ssr, tss = np.full(m, np.nan), np.full(m, np.nan)
+    nobs = rows.sum(axis=0).astype("float64")
+    df_resid = np.full(m, np.nan)
+    # Group responses by missing-data pattern: identical packed row masks share one factorization.
+    _, group = np.unique(np.packbits(rows, axis=0), axis=1, return_inverse=True)
+    for g in np.unique(group.ravel()):
+        cols = np.flatnonzero(group.ravel() == g)
+        use = rows[:, cols[0]]
+        if use.sum() <= k:
+            continue
+        xg, yg = x[use], y[use][:, cols]
+        b, xtx_inv, resid, dfr = _solve_group(xg, yg)
+        if dfr <= 0:
+            continue
+        s2 = np.einsum("ij,ij->j", resid, resid)
+        params[:, cols] = b
+        if cov_type == "nonrobust":
+            bse[:, cols] = np.sqrt(np.outer(np.diag(xtx_inv), s2 / dfr))
+        else:
+            U = xg[:, None, :] * resid[:, :, None]
+            bread = np.broadcast_to(xtx_inv, (len(cols), k, k))
+            leverage = np.broadcast_to(np.einsum("ti,ij,tj->t", xg, xtx_inv, xg)[:, None], resid.shape)
+            bse[:, cols] = _robust_bse(U, bread, nobs[cols], k, cov_type, maxlags, leverage).T
+        ssr[cols] = s2
+        dev = yg - yg.mean(axis=0) if k_const else yg
+        tss[cols] = np.einsum("ij,ij->j", dev, dev)
+        df_resid[cols] = dfr
+    return _pack(names, responses, params, bse, ssr, tss, nobs, df_resid, k_const, cov_type)
+
+
+def ols_univariate(y, X, cov_type="nonrobust", maxlags=None):
+    """Regress y on a constant plus each column of X separately (one simple regression per column).
+
+    Rows where y or that column is missing are dropped per regression; all regressions are computed at once
+    from masked, centered moments. Terms are "const" and "slope"; responses are labelled by X's columns.
+    For HAC, each regression's missing rows are dropped before the lags are taken, as statsmodels would.
+    """
+    _check_cov_type(cov_type)
+    y = np.asarray(y, dtype="float64").reshape(-1)
+    X = _as_frame(X, "x")
+    x = X.to_numpy(dtype="float64")
+    mask = np.isfinite(x) & np.isfinite(y)[:, None]
+    w = mask.astype("float64")
+    xz = np.where(mask, x, 0.0)
+    yz = np.where(mask, y[:, None], 0.0)
+    n = w.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_bar = xz.sum(axis=0) / n
+        y_bar = yz.sum(axis=0) / n
+        dx = (xz - x_bar) * w
+        dy = (yz - y_bar) * w
+        sxx = np.einsum("ij,ij->j", dx, dx)
+        sxy = np.einsum("ij,ij->j", dx, dy)
+        syy = np.einsum("ij,ij->j", dy, dy)
+        slope = sxy / sxx
+        const = y_bar - slope * x_bar
+        ssr = np.maximum(syy - slope * sxy, 0.0)
+        df_resid = n - 2
+        if cov_type == "nonrobust":
+            s2 = ssr / df_resid
+            se = np.vstack([np.sqrt(s2 * (1 / n + x_bar ** 2 / sxx)), np.sqrt(s2 / sxx)])
+        else:
+            # (X'X)^-1 of [1, x] per column, and scores [e, x e] with e the masked residual.
+            bread = np.stack([
+                np.stack([1 / n + x_bar ** 2 / sxx, -x_bar / sxx], axis=-1),
+                np.stack([-x_bar / sxx, 1 / sxx], axis=-1),
+            ], axis=1)
+            e = dy - slope * dx
+            U = np.stack([e, xz * e], axis=-1)
+            if cov_type == "HAC":
+                # Move each column's used rows to the front (in order) so lags never span a gap.
+                order = np.argsort(~mask, axis=0, kind="stable")
+                U = np.take_along_axis(U, order[:, :, None], axis=0)
+            leverage = (w / n + dx ** 2 / sxx) * w
+            se = _robust_bse(np.nan_to_num(U), np.nan_to_num(bread), n, 2, cov_type, maxlags,
+                             np.nan_to_num(leverage)).T
+    bad = (df_resid <= 0) | ~(sxx > 0)
+    params = np.where(bad, np.nan, np.vstack([const, slope]))
+    bse = np.where(bad, np.nan, se)
+    df_resid = np.where(bad, np.nan, df_resid)
+    return _pack(["const", "slope"], list(X.columns), params, bse, ssr, syy, n, df_resid, 1, cov_type)
+
+
+def _window_sums(a, window):
+    """Trailing sums over `window` rows along axis 0 (all rows so far if window is None).
+
+    Rows are cut into blocks of `window`; the sum ending at row j of a block is the prefix sum of that block
+    up to j plus the suffix sum of the previous block after j. Each sum is O(1) and, unlike differencing one
+    long cumulative sum, its rounding error does not grow with the length of the series.
+    """
+    if window is None or window >= len(a):
+        return np.cumsum(a, axis=0)
+    n = len(a)
+    blocks = -(-n // window)
+    padded = np.zeros((blocks * window,) + a.shape[1:])
+    padded[:n] = a
+    padded = padded.reshape((blocks, window) + a.shape[1:])
+    prefix = np.cumsum(padded, axis=1)
+    suffix = np.zeros_like(padded)
+    suffix[:, :-1] = np.cumsum(padded[:, :0:-1], axis=1)[:, ::-1]
+    prefix[1:] += suffix[:-1]
+    return prefix.reshape((blocks * window,) + a.shape[1:])[:n]
+
+
+def _rolling_robust_bse(xz, yz, ok, params, inv, rows, nobs, cov_type, maxlags, chunk_rows=1 << 20):
+    """Robust standard errors for the windows ending at `rows`, each covering its last `nobs` complete rows.
+
+    Rows with missing values are dropped first, so each window is a run of consecutive complete rows and HAC
+    lags never reach across a gap (as statsmodels on the window's dropna'd data). Windows are materialized as
+    strided views of the zero-padded complete rows, a chunk of windows at a time, so the residuals and scores
+    of every window come from one einsum per chunk.
+    """
+    k = xz.shape[1]
+    width = int(nobs.max())
+    xpad = np.concatenate([np.zeros((width - 1, k)), xz[ok]])
+    ypad = np.concatenate([np.zeros(width - 1), yz[ok]])
+    xwin = np.lib.stride_tricks.sliding_window_view(xpad, width, axis=0)  # (n_ok, k, width)
+    ywin = np.lib.stride_tricks.sliding_window_view(ypad, width)  # (n_ok, width)
+    ends = np.cumsum(ok)[rows] - 1  # position of each window's last row among the complete rows
+    bse = np.empty((len(rows), k))
+    step = max(1, chunk_rows // width)
+    for a in range(0, len(rows), step):
+        r = ends[a:a + step]
+        b, bread, m = params[a:a + step], inv[a:a + step], nobs[a:a + step]
+        keep = np.arange(width)[:, None] >= width - m  # (width, batch): the window's own m rows
+        xw = np.where(keep[:, :, None], xwin[r].transpose(2, 0, 1), 0.0)  # (width, batch, k)
+        e = np.where(keep, ywin[r].T - np.einsum("tbi,bi->tb", xw, b), 0.0)
+        leverage = np.einsum("tbi,bij,tbj->tb", xw, bread, xw) if cov_type in ("HC2", "HC3") else None
+        bse[a:a + step] = _robust_bse(xw * e[:, :, None], bread, m, k, cov_type, maxlags, leverage)
+    return bse
+
+
+def rolling_ols(y, X, window=None, min_nobs=None, cov_type="nonrobust", maxlags=None):
+    """OLS of y on X over trailing windows of `window` rows, or expanding from the first row if window is None.
+
+    Each window's X'X, X'y, y'y are running sums (see _window_sums), so every window costs O(k^2) to update
+    instead of a refit. Rows with missing values contribute nothing and are not counted; a window needs at
+    least min_nobs (default k + 1) complete rows. Robust cov_types need each window's residuals and are
+    computed from strided window views (O(window) per window; O(n) per row when expanding); they use only the
+    window's complete rows, so for HAC the lags run over those rows as if the gaps were not there. Returns a frame
+    on the rows' index with the coefficients (named after X's columns), their t-stats ("t_<term>"),
+    rsquared, rsquared_adj and nobs.
+    """
+    _check_cov_type(cov_type)
+    X = _as_frame(X, "x")
+    names = list(X.columns)
+    x = X.to_numpy(dtype="float64")
+    yv = np.asarray(y, dtype="float64").reshape(-1)
+    n, k = x.shape
+    ok = np.isfinite(yv) & np.isfinite(x).all(axis=1)
+    xz = np.where(ok[:, None], x, 0.0)
+    yz = np.where(ok, yv, 0.0)
+    k_const = int(ok.any() and _const_columns(x[ok]).any())
+    min_nobs = k + 1 if min_nobs is None else max(min_nobs, k + 1)
+
+    nobs = _window_sums(ok.astype("float64"), window)
+    xtx = _window_sums(np.einsum("ti,tj->tij", xz, xz), window)
+    xty = _window_sums(xz * yz[:, None], window)
+    yty = _window_sums(yz * yz, window)
+    ysum = _window_sums(yz, window)
+
+    params = np.full((n, k), np.nan)
+    bse = np.full((n, k), np.nan)
+    ssr, tss = np.full(n, np.nan), np.full(n, np.nan)
+    fit = nobs >= min_nobs
+    if fit.any():
+        inv = np.linalg.pinv(xtx[fit], hermitian=True)
+        b = np.einsum("tij,tj->ti", inv, xty[fit])
+        ssr[fit] = np.maximum(yty[fit] - np.einsum("ti,ti->t", b, xty[fit]), 0.0)
+        tss[fit] = yty[fit] - ysum[fit] ** 2 / nobs[fit] if k_const else yty[fit]
+        params[fit] = b
+        if cov_type == "nonrobust":
+            s2 = ssr[fit] / (nobs[fit] - k)
+            bse[fit] = np.sqrt(np.clip(np.einsum("tii->ti", inv), 0.0, None) * s2[:, None])
+        else:
+            bse[fit] = _rolling_robust_bse(xz, yz, ok, b, inv, np.flatnonzero(fit), nobs[fit], cov_type, maxlags)
+    df_resid = np.where(fit, nobs - k, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsquared = 1 - ssr / tss
+        rsquared_adj = 1 - (nobs - k_const) / df_resid * (1 - rsquared)
+        tvalues = params / bse
+    out = pd.DataFrame(params, index=X.index, columns=names)
+    out[[f"t_{c}" for c in names]] = tvalues
+    out["rsquared"] = rsquared
+    out["rsquared_adj"] = rsquared_adj
+    out["nobs"] = nobs.astype("int64")
+    return out
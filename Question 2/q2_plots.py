@@ -0,0 +1,185 @@
+"""Q2 figures, drawn in background worker processes and skipped when their input data is unchanged.
+
+render(figure, filename, *args) hashes the figure function's name, its arguments (frames by content) and this
+module's source. If that key equals the one stored next to the existing PNG (<filename>.hash), the figure is
+left alone; otherwise it is drawn on a process pool while the calling script carries on computing (the worker
+also pays matplotlib's import). The PNG and its key are written atomically by the worker, so an interrupted
+run never leaves a key for a stale picture. finish(pending) waits for a script's figures and reports them.
+"""
+import hashlib
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from q2_common import pyplot
+from q2_config import OUT_DIR, PLOT_MAX_POINTS, PLOT_WORKERS, ROLLING_WINDOW_MONTHS
+
+DPI = 150
+_POOL = None
+with open(__file__, "rb") as _f:
+    _SOURCE_HASH = hashlib.sha256(_f.read()).hexdigest()
+
+
+def decimate(data, max_points=PLOT_MAX_POINTS):
+    """At most ~max_points rows of a line series (Series or frame): the first and last rows plus, per bucket,
+    the rows holding each column's min and max, so spikes stay visible. Shorter series are returned as is."""
+    n = len(data)
+    if n <= max_points:
+        return data
+    values = np.asarray(data, dtype="float64").reshape(n, -1)
+    buckets = max(1, max_points // (2 * values.shape[1]))
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    keep = [np.array([0, n - 1])]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        block = values[lo:hi]
+        missing = np.isnan(block)
+        keep.append(lo + np.where(missing, np.inf, block).argmin(axis=0))
+        keep.append(lo + np.where(missing, -np.inf, block).argmax(axis=0))
+    return data.iloc[np.unique(np.concatenate(keep))]
+
+
+def _update(h, obj):
+    """Feed obj's content into hash h (frames and arrays by value, containers recursively)."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        labels = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+        h.update(repr((type(obj).__name__, obj.shape, labels)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype.str, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for k in sorted(obj):
+            _update(h, k)
+            _update(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"[{len(obj)}".encode())
+        for item in obj:
+            _update(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def input_hash(figure, args, kwargs):
+    h = hashlib.sha256(f"{_SOURCE_HASH}:{figure.__name__}:{DPI}".encode())
+    _update(h, list(args))
+    _update(h, kwargs)
+    return h.hexdigest()
+
+
+def _stored_hash(path):
+    try:
+        with open(path + ".hash") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _draw(figure, path, key, args, kwargs):
+    """Draw one figure to path (runs in a worker). False if matplotlib is unavailable."""
+    plt = pyplot()
+    if plt is None:
+        return False
+    fig = figure(plt, *args, **kwargs)
+    fig.savefig(path + ".tmp", format="png", dpi=DPI, bbox_inches="tight")
+    plt.close(fig)
+    os.replace(path + ".tmp", path)
+    with open(path + ".hash.tmp", "w") as f:
+        f.write(key)
+    os.replace(path + ".hash.tmp", path + ".hash")
+    return True
+
+
+def _pool():
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=PLOT_WORKERS)
+    return _POOL
+
+
+def render(figure, filename, *args, **kwargs):
+    """Draw figure(plt, *args, **kwargs) to OUT_DIR/filename in the background unless its inputs are unchanged.
+
+    Returns (filename, future); the future's result is True (drawn), False (no matplotlib) or None (skipped).
+    """
+    path = os.path.join(OUT_DIR, filename)
+    key = input_hash(figure, args, kwargs)
+    if os.path.isfile(path) and _stored_hash(path) == key:
+        fut = Future()
+        fut.set_result(None)
+    elif PLOT_WORKERS:
+        fut = _pool().submit(_draw, figure, path, key, args, kwargs)
+    else:
+        fut = Future()
+        fut.set_result(_draw(figure, path, key, args, kwargs))
+    return filename, fut
+
+
+def finish(pending):
+    """Wait for render() results and print what happened to each figure."""
+    for filename, fut in pending:
+        drawn = fut.result()
+        if drawn:
+            print(f"Saved: {filename}")
+        elif drawn is None:
+            print(f"Unchanged: {filename} (same input data)")
+
+
+# ---------------------------------------------------------------------------
+# Figures: each takes pyplot plus plain data and returns the figure
+# ---------------------------------------------------------------------------
+
+def regression_diagnostics(plt, data, const, beta_umd, r2):
+    """Q2.1 four-panel plot; data has UMD, SPMO_excess and resid columns (monthly returns)."""
+    from scipy.stats import probplot
+
+    fig, axes = plt.subplots(2, 2, figsize=(12, 9))
+    ax1, ax2, ax3, ax4 = axes.flat
+    ax1.scatter(data["UMD"] * 100, data["SPMO_excess"] * 100, alpha=0.6, s=25)
+    ax1.plot(data["UMD"] * 100, (const + beta_umd * data["UMD"]) * 100, "r-", lw=2,
+             label="β_UMD={:.3f} (ctrl Mkt), R²={:.3f}".format(beta_umd, r2))
+    ax1.set_xlabel("UMD (%)"); ax1.set_ylabel("SPMO excess (%)"); ax1.legend(); ax1.grid(True, alpha=0.3)
+    resid = decimate(data["resid"])
+    ax2.plot(resid.index, resid * 100, "o-", ms=2, alpha=0.7)
+    ax2.axhline(0, color="red", ls="--"); ax2.set_xlabel("Date"); ax2.set_ylabel("Residual (%)"); ax2.grid(True, alpha=0.3)
+    ax3.hist(data["resid"] * 100, bins=25, density=True, alpha=0.7, edgecolor="k")
+    ax3.set_xlabel("Residual (%)"); ax3.set_ylabel("Density"); ax3.grid(True, alpha=0.3)
+    probplot(data["resid"], dist="norm", plot=ax4); ax4.set_title("Q-Q"); ax4.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+
+def kalman_betas(plt, smoothed, rolling, ols_params, factors=("Mkt-RF", "UMD")):
+    """Q2.1 Kalman-smoothed betas with 95% bands against rolling and full-sample OLS betas."""
+    fig, axes = plt.subplots(len(factors), 1, figsize=(12, 7), sharex=True)
+    for ax, factor in zip(axes, factors):
+        path = decimate(smoothed[[factor, f"{factor}_low", f"{factor}_high"]])
+        roll = decimate(rolling[factor])
+        ax.fill_between(path.index, path[f"{factor}_low"], path[f"{factor}_high"], alpha=0.25, label="95% band")
+        ax.plot(path.index, path[factor], lw=2, label="Kalman smoothed")
+        ax.plot(roll.index, roll, "--", lw=1, label="Rolling {}m OLS".format(ROLLING_WINDOW_MONTHS))
+        ax.axhline(ols_params[factor], color="red", ls=":", label="Full-sample OLS")
+        ax.set_ylabel("β ({})".format(factor)); ax.legend(loc="best", fontsize=8); ax.grid(True, alpha=0.3)
+    axes[-1].set_xlabel("Date")
+    fig.tight_layout()
+    return fig
+
+
+def momentum_decomposition(plt, comp_plot):
+    """Q2.3 betas and R² of SPMO on each momentum portfolio (comp_plot: Model, Beta, R-squared)."""
+    betas = comp_plot["Beta"]
+    r2s = comp_plot["R-squared"]
+    fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+    colors = ["#2ecc71" if b > 0 else "#e74c3c" for b in betas]
+    axes[0].barh(comp_plot["Model"], betas, alpha=0.7, color=colors)
+    axes[0].set_xlabel("Beta"); axes[0].set_title("SPMO beta to momentum portfolios")
+    axes[0].axvline(0, color="black", linewidth=0.8)
+    b_max = max(abs(betas.max()), abs(betas.min()), 0.1)
+    axes[0].set_xlim(-b_max - 0.05, b_max + 0.05)
+    axes[0].grid(True, alpha=0.3, axis="x")
+    axes[1].barh(comp_plot["Model"], r2s, alpha=0.7, color="steelblue")
+    axes[1].set_xlabel("R²"); axes[1].set_title("R-squared"); axes[1].set_xlim(0, min(1.0, max(r2s) * 1.2 + 0.05))
+    axes[1].grid(True, alpha=0.3, axis="x")
+    fig.tight_layout()
+    return fig
@@ -1,7 +1,17 @@
+"""Q2 report: REPORT_Q2.md and REPORT_Q2.pdf from the q2_* outputs.
+
+load_results() reads every input once into a ReportResults, which both builders render. Each report section has
+a fingerprint (its inputs, including the figure it embeds, and this script's code) stored in
+REPORT_SECTIONS_FILE; when no section's fingerprint changed, the existing MD and PDF are kept as they are.
+"""
+import csv
+import hashlib
+import json
+import math
 import os
 import sys
+from collections import namedtuple
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-import pandas as pd
 
 from q2_config import (
     COMPARISON_FEATURES,
@@ -13,59 +23,130 @@ from q2_config import (
     REPORT_PLOT_Q3,
     SPMO_QUOTE,
 )
+from q2_store import load_run, lookup
+
+REPORT_SECTIONS_FILE = os.path.join(OUT_DIR, ".q2_report_sections.json")
+
+# q1: Q2.1 summary dict; q3 / q4: rows keyed by Model / Factor; q5: one row per ETF
+ReportResults = namedtuple("ReportResults", ["q1", "q3", "q4", "q5"])
+
+
+def _cell(v):
+    if v == "":
+        return math.nan
+    try:
+        return float(v)
+    except ValueError:
+        return v
+
+
+def _read_csv(p):
+    """Rows of a small q2_* CSV as dicts, numeric cells as floats (the csv module avoids importing pandas)."""
+    with open(p, newline="") as f:
+        return [{k: _cell(v) for k, v in row.items()} for row in csv.DictReader(f)]
 
 
 def _get_q1():
-    p = os.path.join(OUT_DIR, "q2_1_regression_summary.csv")
-    if not os.path.isfile(p):
+    """Q2.1 headline numbers from the latest run in the results store (full precision), or None."""
+    run = load_run("q2_1")
+    if run is None:
         return None
-    df = pd.read_csv(p)
-    out = {}
-    for _, row in df.iterrows():
-        m, v = row["Metric"], row["Value"]
-        if m == "Beta (UMD)":
-            out["beta_umd"] = float(v)
-        elif m == "Alpha (annualized)":
-            out["alpha_annual"] = float(v)
-        elif m == "R-squared":
-            out["r_squared"] = float(v)
-        elif m == "N":
-            out["observations"] = int(float(v))
-        elif m == "Start":
-            out["start"] = str(v)
-        elif m == "End":
-            out["end"] = str(v)
-    return out if out else None
+    coef, stats, meta = run["coefficients"], run["statistics"], run["metadata"][0]
+    out = {
+        "beta_umd": lookup(coef, "estimate", model="market_controlled", term="UMD"),
+        "alpha_annual": lookup(stats, "value", model="market_controlled", statistic="alpha_annualized"),
+        "r_squared": lookup(stats, "value", model="market_controlled", statistic="rsquared"),
+        "observations": meta["nobs"],
+        "start": meta["sample_start"].strftime("%Y-%m"),
+        "end": meta["sample_end"].strftime("%Y-%m"),
+    }
+    for key, stat in (("alpha_ci_low", "alpha_annualized_bca_low"), ("alpha_ci_high", "alpha_annualized_bca_high")):
+        value = lookup(stats, "value", model="market_controlled", statistic=stat)
+        if value is not None:
+            out[key] = value
+    return out
+
+
+def _alpha_ci_text(q1):
+    """Bootstrap interval sentence for the annualized alpha, or "" if Q2.1 did not write one."""
+    if "alpha_ci_low" not in q1 or "alpha_ci_high" not in q1:
+        return ""
+    return (f" The 95% block-bootstrap (BCa) interval for annualized alpha is "
+            f"[{q1['alpha_ci_low']:.2%}, {q1['alpha_ci_high']:.2%}] (see q2_1_bootstrap_ci.csv).")
 
 
 def _get_q3():
     p = os.path.join(OUT_DIR, "q2_3_all_models_summary.csv")
     if not os.path.isfile(p):
-        return None
-    return pd.read_csv(p)
+        return {}
+    return {r["Model"]: r for r in _read_csv(p)}
 
 
 def _get_q4():
     p = os.path.join(OUT_DIR, "q2_4_ff6_regression_results.csv")
     if not os.path.isfile(p):
-        return None
-    return pd.read_csv(p)
+        return {}
+    return {r["Factor"]: r for r in _read_csv(p)}
 
 
 def _get_q5():
     p = os.path.join(OUT_DIR, "q2_5_other_etfs_ff6.csv")
     if not os.path.isfile(p):
         return []
-    df = pd.read_csv(p)
-    return df.to_dict("records")
+    return _read_csv(p)
+
+
+def load_results():
+    """Everything the report shows from the Q2 outputs, each file read once."""
+    return ReportResults(_get_q1(), _get_q3(), _get_q4(), _get_q5())
 
 
-def build_md():
-    """Build report markdown from files and config. Returns string."""
-    q1 = _get_q1()
-    q3 = _get_q3()
-    q4 = _get_q4()
-    q5 = _get_q5()
+def _value(rows, key, col):
+    """rows[key][col] for rows keyed by Model / Factor, or None if that row is missing."""
+    row = rows.get(key)
+    return None if row is None else row[col]
+
+
+def _file_hash(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def section_fingerprints(results):
+    """Hash per report section of what it renders (results, config text, embedded figure) and this code."""
+    inputs = {
+        "1": [results.q1, _file_hash(os.path.join(OUT_DIR, REPORT_PLOT_Q1))],
+        "2": [SPMO_QUOTE, COMPARISON_FEATURES, COMPARISON_UMD, COMPARISON_SPMO],
+        "3": [results.q3, _file_hash(os.path.join(OUT_DIR, REPORT_PLOT_Q3))],
+        "4": [results.q4],
+        "5": [results.q5, OTHER_ETF_TICKERS],
+    }
+    code = _file_hash(os.path.abspath(__file__))
+    return {
+        name: hashlib.sha256(json.dumps([code, value], sort_keys=True, default=str).encode()).hexdigest()
+        for name, value in inputs.items()
+    }
+
+
+def _load_fingerprints():
+    try:
+        with open(REPORT_SECTIONS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_fingerprints(fingerprints):
+    with open(REPORT_SECTIONS_FILE + ".tmp", "w") as f:
+        json.dump(fingerprints, f, indent=1, sort_keys=True)
+    os.replace(REPORT_SECTIONS_FILE + ".tmp", REPORT_SECTIONS_FILE)
+
+
+def build_md(results=None):
+    """Build report markdown from the results (default: load_results()). Returns string."""
+    q1, q3, q4, q5 = results or load_results()
     lines = []
     lines.append("# MFIN 7037 Homework 1 – Question 2: Smart Beta ETFs (SPMO)")
     lines.append("")
@@ -77,6 +158,9 @@ def build_md():
         start = q1.get("start", "")
         end = q1.get("end", "")
         lines.append(f"The beta of SPMO to the UMD factor (from a regression of SPMO excess return on Mkt-RF and UMD, controlling for market) is **{q1['beta_umd']:.4f}** over {start} to {end} (N={n} months); R² is **{q1['r_squared']:.4f}** and alpha (annualized) is **{q1['alpha_annual']:.2%}**. This shows meaningful momentum exposure. A bivariate regression of SPMO on UMD alone gives a misleadingly low beta because SPMO is mostly market and UMD is market-neutral, so the market-controlled regression is the appropriate specification.")
+        if _alpha_ci_text(q1):
+            lines.append("")
+            lines.append(_alpha_ci_text(q1).strip())
         lines.append("")
         lines.append(f"**Does this mean the ETF is broken?** **No.** A beta to UMD below 1 (here {q1['beta_umd']:.2f}) is expected because: UMD is long-short while SPMO is long-only (one leg), SPMO has full market exposure (S&P 500) while UMD is market-neutral, and universe, weighting, and rebalancing differ from academic UMD.")
     else:
@@ -103,14 +187,11 @@ def build_md():
     # --- 3 ---
     lines.append("## 3) Extra credit: Beta to long-leg; construct long/short; VW vs EW; consistency")
     lines.append("")
-    if q3 is not None and len(q3):
-        def val(df, model, col):
-            r = df[df["Model"] == model]
-            return r[col].iloc[0] if len(r) else None
-        beta_vw = val(q3, "Winners_VW", "Beta")
-        beta_ew = val(q3, "Winners_EW", "Beta")
-        r2_vw = val(q3, "Winners_VW", "R-squared")
-        r2_ew = val(q3, "Winners_EW", "R-squared")
+    if q3:
+        beta_vw = _value(q3, "Winners_VW", "Beta")
+        beta_ew = _value(q3, "Winners_EW", "Beta")
+        r2_vw = _value(q3, "Winners_VW", "R-squared")
+        r2_ew = _value(q3, "Winners_EW", "R-squared")
         if beta_vw is not None:
             lines.append(f"- **Beta to long leg:** Winners_VW β ≈ {beta_vw:.3f} (R² ≈ {r2_vw:.3f}); Winners_EW β ≈ {beta_ew:.3f} (R² ≈ {r2_ew:.3f}).")
         lines.append("")
@@ -125,14 +206,11 @@ def build_md():
     # --- 4 ---
     lines.append("## 4) Control for Fama–French factors. Map to SPMO definition. Does correcting for long-bias fix market beta? Size-bias?")
     lines.append("")
-    if q4 is not None and len(q4):
-        def fval(df, factor, col):
-            r = df[df["Factor"] == factor]
-            return r[col].iloc[0] if len(r) else None
-        mkt = fval(q4, "Mkt-RF", "Beta")
-        smb = fval(q4, "SMB", "Beta")
-        umd = fval(q4, "UMD", "Beta")
-        alpha = fval(q4, "Alpha", "Beta")
+    if q4:
+        mkt = _value(q4, "Mkt-RF", "Beta")
+        smb = _value(q4, "SMB", "Beta")
+        umd = _value(q4, "UMD", "Beta")
+        alpha = _value(q4, "Alpha", "Beta")
         if mkt is not None:
             alpha_ann = ((1 + alpha) ** 12 - 1) * 100 if alpha is not None else 0
             lines.append(f"- **FF6:** Market beta ≈ {mkt:.3f}, SMB ≈ {smb:.3f}, UMD ≈ {umd:.3f}; alpha (annual) ≈ {alpha_ann:.2f}%.")
@@ -179,8 +257,8 @@ def _b(s):
     return f"<b>{s}</b>"
 
 
-def build_pdf(pdf_path):
-    """Build PDF programmatically: proper tables, bold text, embedded plots."""
+def build_pdf(pdf_path, results=None):
+    """Build PDF programmatically from the results (default: load_results()): tables, bold text, plots."""
     try:
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import letter
@@ -218,11 +296,7 @@ def build_pdf(pdf_path):
     body.spaceAfter = 4
     table_text = ParagraphStyle(name="TableText", parent=body, fontSize=9, spaceAfter=0)
     story = []
-
-    q1 = _get_q1()
-    q3 = _get_q3()
-    q4 = _get_q4()
-    q5 = _get_q5()
+    q1, q3, q4, q5 = results or load_results()
 
     # Title
     story.append(Paragraph("MFIN 7037 Homework 1 – Question 2: Smart Beta ETFs (SPMO)", style_title))
@@ -243,7 +317,7 @@ def build_pdf(pdf_path):
         ))
         story.append(Paragraph(
             f"• {_b('R²:')} {q1['r_squared']:.4f}; {_b('Alpha (annualized):')} {q1['alpha_annual']:.2%}. "
-            f"Sample: {start} to {end} (N={n} months).",
+            f"Sample: {start} to {end} (N={n} months).{_alpha_ci_text(q1)}",
             body,
         ))
         story.append(Paragraph(
@@ -298,14 +372,11 @@ def build_pdf(pdf_path):
         "3) Extra credit: Beta to long-leg; construct long/short; VW vs EW; consistency",
         style_h2,
     ))
-    if q3 is not None and len(q3):
-        def val(df, model, col):
-            r = df[df["Model"] == model]
-            return r[col].iloc[0] if len(r) else None
-        beta_vw = val(q3, "Winners_VW", "Beta")
-        beta_ew = val(q3, "Winners_EW", "Beta")
-        r2_vw = val(q3, "Winners_VW", "R-squared")
-        r2_ew = val(q3, "Winners_EW", "R-squared")
+    if q3:
+        beta_vw = _value(q3, "Winners_VW", "Beta")
+        beta_ew = _value(q3, "Winners_EW", "Beta")
+        r2_vw = _value(q3, "Winners_VW", "R-squared")
+        r2_ew = _value(q3, "Winners_EW", "R-squared")
         if beta_vw is not None:
             story.append(Paragraph(
                 f"• {_b('Beta to long leg:')} Winners_VW β ≈ {beta_vw:.3f} (R² ≈ {r2_vw:.3f}); "
@@ -338,14 +409,11 @@ def build_pdf(pdf_path):
         "4) Control for Fama–French factors. Map to SPMO definition. Does correcting for long-bias fix market beta? Size-bias?",
         style_h2,
     ))
-    if q4 is not None and len(q4):
-        def fval(df, factor, col):
-            r = df[df["Factor"] == factor]
-            return r[col].iloc[0] if len(r) else None
-        mkt = fval(q4, "Mkt-RF", "Beta")
-        smb = fval(q4, "SMB", "Beta")
-        umd = fval(q4, "UMD", "Beta")
-        alpha = fval(q4, "Alpha", "Beta")
+    if q4:
+        mkt = _value(q4, "Mkt-RF", "Beta")
+        smb = _value(q4, "SMB", "Beta")
+        umd = _value(q4, "UMD", "Beta")
+        alpha = _value(q4, "Alpha", "Beta")
         if mkt is not None:
             alpha_ann = ((1 + alpha) ** 12 - 1) * 100 if alpha is not None else 0
             story.append(Paragraph(
@@ -447,17 +515,26 @@ def _add_plot(story, body_style, out_dir, filename, caption):
         pass
 
 
-def main():
+def main(ctx=None):
     print("=" * 60)
     print("Q2 Report: building REPORT_Q2.md and REPORT_Q2.pdf")
     print("=" * 60)
-    md_content = build_md()
+    results = load_results()
     md_path = os.path.join(OUT_DIR, "REPORT_Q2.md")
     pdf_path = os.path.join(OUT_DIR, "REPORT_Q2.pdf")
+    fingerprints = section_fingerprints(results)
+    previous = _load_fingerprints()
+    changed = [name for name, fp in fingerprints.items() if previous.get(name) != fp]
+    if not changed and os.path.isfile(md_path) and os.path.isfile(pdf_path):
+        print("No section's inputs changed; REPORT_Q2.md and REPORT_Q2.pdf are up to date.")
+        print("\nDone. Outputs in:", OUT_DIR)
+        return
+    print("Sections with new inputs:", ", ".join(changed) if changed else "none (output missing)")
     with open(md_path, "w") as f:
-        f.write(md_content)
+        f.write(build_md(results))
     print("Wrote:", md_path)
-    if build_pdf(pdf_path):
+    if build_pdf(pdf_path, results):
+        _save_fingerprints(fingerprints)
         print("Wrote:", pdf_path)
     else:
         print("PDF not built (install reportlab). You can print MD to PDF from your editor.")
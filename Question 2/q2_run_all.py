@@ -1,35 +1,231 @@
+"""Run the Q2 pipeline as a DAG of stages, skipping stages whose inputs have not changed.
+
+Each stage declares the stages it reads from and the files it writes. A stage's key hashes its code (the script
+and every local module it imports, transitively), the content of its upstream stages' outputs and, for stages
+that download data, the requested data (START_DATE, END_DATE, PRICE_FILE contents, DATA_MODE). A stage is
+skipped when its key and the hashes of its outputs match the last successful run (RUN_STATE_FILE). A stage's
+latest run in the results store (q2_store) is one of its outputs, hashed by value. Because the comparison is
+on content, a rerun stage that reproduces the same files and results does not invalidate later stages.
+Stages whose dependencies are done run in parallel worker processes.
+
+    python q2_run_all.py               # run what is out of date
+    python q2_run_all.py --refresh     # also rerun the download stages (fetch new data)
+    python q2_run_all.py --force       # rerun everything
+    python q2_run_all.py --in-process  # one interpreter with shared data, stages one at a time
+"""
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import os
 import subprocess
 import sys
+import threading
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from q2_config import DATA_MODE, END_DATE, OUT_DIR, PRICE_FILE, START_DATE
+
+# store: the q2_store stage the script writes a run to; its latest run counts as an output (by value).
+Stage = namedtuple("Stage", ["script", "deps", "external", "outputs", "store"], defaults=(None,))
+
+STAGES = {
+    "q2_1": Stage("q2_1_spmo_umd_beta.py", (), True, (
+        "q2_1_regression_summary.csv", "q2_1_spmo_umd_data.csv", "q2_1_rolling_betas.csv",
+        "q2_1_bootstrap_ci.csv", "q2_1_kalman_betas.csv",
+        "q2_1_spmo_umd_regression_diagnostics.png", "q2_1_kalman_betas.png",
+    ), store="q2_1"),
+    "q2_2": Stage("q2_2_methodology.py", ("q2_1",), False, ("q2_2_methodology_comparison.csv",)),
+    "q2_3": Stage("q2_3_long_leg.py", ("q2_1",), True, (
+        "q2_3_all_models_summary.csv", "q2_3_momentum_portfolios.csv", "q2_3_fama_macbeth.csv",
+        "q2_3_fama_macbeth_assets.csv", "q2_3_grs_rolling.csv", "q2_3_momentum_decomposition.png",
+    )),
+    "q2_4": Stage("q2_4_ff6_controls.py", ("q2_1",), True, (
+        "q2_4_ff6_regression_results.csv", "q2_4_ff6_rolling_betas.csv",
+    )),
+    "q2_5": Stage("q2_5_other_etfs.py", ("q2_1",), True, ("q2_5_other_etfs_ff6.csv", "q2_5_grs.csv")),
+    "report": Stage("q2_report.py", ("q2_1", "q2_2", "q2_3", "q2_4", "q2_5"), False, (
+        "REPORT_Q2.md", "REPORT_Q2.pdf",
+    )),
+}
+SCRIPTS = [s.script for s in STAGES.values()]
+RUN_STATE_FILE = os.path.join(OUT_DIR, ".q2_run_state.json")
+
+
+def _file_hash(path):
+    if not os.path.isfile(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _local_modules(script, script_dir):
+    """The script plus every module in script_dir it imports, directly or indirectly."""
+    seen, todo = set(), [script]
+    while todo:
+        name = todo.pop()
+        path = os.path.join(script_dir, name)
+        if name in seen or not os.path.isfile(path):
+            continue
+        seen.add(name)
+        with open(path) as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                todo.extend(a.name.split(".")[0] + ".py" for a in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                todo.append(node.module.split(".")[0] + ".py")
+    return sorted(seen)
+
+
+def _external_fingerprint():
+    """What the download stages ask for; a new END_DATE (e.g. the next day) or a changed price file reruns them."""
+    return json.dumps({
+        "start": START_DATE, "end": END_DATE, "data_mode": DATA_MODE,
+        "price_file": PRICE_FILE and [PRICE_FILE, _file_hash(PRICE_FILE)],
+    }, sort_keys=True)
+
+
+def _output_hashes(stage):
+    hashes = {f: _file_hash(os.path.join(OUT_DIR, f)) for f in stage.outputs}
+    if stage.store:
+        from q2_store import run_digest
+
+        hashes[f"results/{stage.store}"] = run_digest(stage.store)
+    return hashes
 
-from q2_config import OUT_DIR
 
-SCRIPTS = [
-    "q2_1_spmo_umd_beta.py",
-    "q2_2_methodology.py",
-    "q2_3_long_leg.py",
-    "q2_4_ff6_controls.py",
-    "q2_5_other_etfs.py",
-    "q2_report.py",
-]
+def _stage_key(name, script_dir, external):
+    stage = STAGES[name]
+    h = hashlib.sha256()
+    for module in _local_modules(stage.script, script_dir):
+        h.update(f"{module}:{_file_hash(os.path.join(script_dir, module))}\n".encode())
+    for dep in stage.deps:
+        h.update(json.dumps(_output_hashes(STAGES[dep]), sort_keys=True).encode())
+    if stage.external:
+        h.update(external.encode())
+    return h.hexdigest()
 
 
-def main():
-    import os
+def load_state(path=RUN_STATE_FILE):
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def save_state(state, path=RUN_STATE_FILE):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _subprocess_runner(script_dir):
+    """Run a stage's script in its own interpreter; its output is printed in one piece when it finishes."""
+    lock = threading.Lock()
+
+    def run(name):
+        path = os.path.join(script_dir, STAGES[name].script)
+        proc = subprocess.run([sys.executable, path], capture_output=True, text=True)
+        with lock:
+            print(f"\n----- {name} ({STAGES[name].script}) -----")
+            sys.stdout.write(proc.stdout)
+            sys.stdout.write(proc.stderr)
+            if proc.returncode != 0:
+                print(f"Warning: {STAGES[name].script} exited with code {proc.returncode}")
+            sys.stdout.flush()
+        return proc.returncode == 0
+    return run
+
+
+def _in_process_runner(script_dir):
+    """Run every stage's main() in this interpreter, sharing one lazily loaded Q2Data context."""
+    sys.path.insert(0, script_dir)
+    from q2_common import Q2Data
+
+    ctx = Q2Data()
+
+    def run(name):
+        print(f"\n----- {name} ({STAGES[name].script}, in-process) -----")
+        try:
+            importlib.import_module(STAGES[name].script[:-3]).main(ctx)
+            return True
+        except Exception:
+            traceback.print_exc()
+            print(f"Warning: {STAGES[name].script} failed")
+            return False
+    return run
+
+
+def run_dag(script_dir, runner, jobs=1, force=False, refresh=False):
+    """Run out-of-date stages, each once its dependencies are done, up to `jobs` at a time.
+
+    A failed stage is not recorded (it reruns next time); stages after it still run on whatever files exist.
+    Returns {stage: "ran" | "skipped" | "failed"}.
+    """
+    state = load_state()
+    external = _external_fingerprint()
+    status, pending, running = {}, list(STAGES), {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            ready = [n for n in pending if all(d in status for d in STAGES[n].deps)]
+            for name in ready:
+                pending.remove(name)
+                stage = STAGES[name]
+                key = _stage_key(name, script_dir, external)
+                prev = state.get(name, {})
+                rerun = force or (refresh and stage.external)
+                if not rerun and prev.get("key") == key and prev.get("outputs") == _output_hashes(stage):
+                    print(f"[skip] {name}: up to date")
+                    status[name] = "skipped"
+                    continue
+                print(f"[run]  {name} ...")
+                running[pool.submit(runner, name)] = (name, key)
+            if ready and not running:
+                continue  # skipped stages may have unblocked others
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, key = running.pop(fut)
+                if fut.result():
+                    state[name] = {"key": key, "outputs": _output_hashes(STAGES[name])}
+                    status[name] = "ran"
+                else:
+                    state.pop(name, None)
+                    status[name] = "failed"
+                save_state(state)
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run all Q2 questions, then the report (only what is out of date).")
+    parser.add_argument(
+        "--in-process", action="store_true",
+        help="run all steps in one interpreter with shared data instead of one subprocess per script",
+    )
+    parser.add_argument("--force", action="store_true", help="rerun every stage")
+    parser.add_argument("--refresh", action="store_true", help="rerun the stages that download data")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="stages to run at once (subprocess mode; default: CPU count)")
+    args = parser.parse_args(argv)
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
     print("=" * 60)
     print("MFIN 7037 Q2: Running all questions then report")
     print("=" * 60)
-    for i, name in enumerate(SCRIPTS, 1):
-        path = os.path.join(script_dir, name)
-        if not os.path.isfile(path):
-            print(f"[Skip] {name} not found")
-            continue
-        print(f"\n[{i}/{len(SCRIPTS)}] Running {name} ...")
-        rc = subprocess.call([sys.executable, path])
-        if rc != 0:
-            print(f"Warning: {name} exited with code {rc}")
+    if args.in_process:
+        status = run_dag(script_dir, _in_process_runner(script_dir), 1, args.force, args.refresh)
+    else:
+        status = run_dag(script_dir, _subprocess_runner(script_dir), max(1, args.jobs), args.force, args.refresh)
     print("\n" + "=" * 60)
+    print("Stages: " + ", ".join(f"{name} {result}" for name, result in status.items()))
     print("All done. Outputs (including REPORT_Q2.md and REPORT_Q2.pdf) in:")
     print(OUT_DIR)
     print("=" * 60)
@@ -0,0 +1,123 @@
+"""Typed, append-only store of stage results (parquet with fixed Arrow schemas), one directory per stage.
+
+Each run of a stage appends one part file per table, named by its run_id:
+
+    RESULTS_DIR/<stage>/coefficients/<run_id>.parquet   model, term, estimate, std_error, t_stat, p_value, ci_low, ci_high
+    RESULTS_DIR/<stage>/statistics/<run_id>.parquet     model, statistic, value
+    RESULTS_DIR/<stage>/metadata/<run_id>.parquet       sample_start, sample_end, nobs, cov_type, end_date
+
+Every row also carries run_id and run_time. Values stay float64 (nothing is formatted to text), so later stages
+read exactly what was estimated and runs can be compared side by side. run_ids sort in time order and the metadata
+part is written last, so a run is complete once its metadata exists; loading the latest run reads three small
+files, and read_table(..., run_id=None) loads every run of a table at once. Only pyarrow is needed (no pandas),
+and it is imported on first use.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from q2_config import RESULTS_DIR
+
+TABLES = ["coefficients", "statistics", "metadata"]  # write order: metadata last marks a run complete
+
+
+@lru_cache(maxsize=None)
+def schemas():
+    """{table: Arrow schema}; pyarrow is imported on first use so importing this module stays cheap."""
+    import pyarrow as pa
+
+    run_fields = [("run_id", pa.string()), ("run_time", pa.timestamp("us", tz="UTC"))]
+    return {
+        "coefficients": pa.schema(run_fields + [
+            ("model", pa.string()), ("term", pa.string()), ("estimate", pa.float64()), ("std_error", pa.float64()),
+            ("t_stat", pa.float64()), ("p_value", pa.float64()), ("ci_low", pa.float64()), ("ci_high", pa.float64()),
+        ]),
+        "statistics": pa.schema(run_fields + [("model", pa.string()), ("statistic", pa.string()), ("value", pa.float64())]),
+        "metadata": pa.schema(run_fields + [
+            ("sample_start", pa.date32()), ("sample_end", pa.date32()), ("nobs", pa.int64()),
+            ("cov_type", pa.string()), ("end_date", pa.string()),
+        ]),
+    }
+
+
+def _part_path(stage, table, run_id):
+    return os.path.join(RESULTS_DIR, stage, table, f"{run_id}.parquet")
+
+
+def write_run(stage, coefficients, statistics, metadata):
+    """Append one run of a stage: lists of row dicts for coefficients and statistics, one metadata dict.
+
+    Missing optional fields are stored as nulls; a field of the wrong type raises. Returns the run_id.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    now = datetime.now(timezone.utc)
+    run_id = f"{now:%Y%m%dT%H%M%S.%fZ}-{os.getpid()}"
+    rows = {"coefficients": coefficients, "statistics": statistics, "metadata": [metadata]}
+    for table in TABLES:
+        data = pa.Table.from_pylist([{"run_id": run_id, "run_time": now, **r} for r in rows[table]],
+                                    schema=schemas()[table])
+        path = _part_path(stage, table, run_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(data, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return run_id
+
+
+def runs(stage):
+    """run_ids of the complete runs of a stage, oldest first."""
+    d = os.path.join(RESULTS_DIR, stage, "metadata")
+    if not os.path.isdir(d):
+        return []
+    return sorted(f[:-len(".parquet")] for f in os.listdir(d) if f.endswith(".parquet"))
+
+
+def read_table(stage, table, run_id="latest"):
+    """One table of a stage as an Arrow table: the latest complete run, a given run_id, or every run (None).
+
+    Returns None if the stage has no (such) run.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    ids = runs(stage)
+    if run_id is None:
+        if not ids:
+            return None
+        return pa.concat_tables([pq.read_table(_part_path(stage, table, r), schema=schemas()[table]) for r in ids])
+    if run_id == "latest":
+        if not ids:
+            return None
+        run_id = ids[-1]
+    elif run_id not in ids:
+        return None
+    return pq.read_table(_part_path(stage, table, run_id), schema=schemas()[table])
+
+
+def load_run(stage, run_id="latest"):
+    """{table: list of row dicts} for one run of a stage (default: the latest), or None if there is none."""
+    tables = {t: read_table(stage, t, run_id) for t in TABLES}
+    if tables["metadata"] is None:
+        return None
+    return {t: data.to_pylist() for t, data in tables.items()}
+
+
+def run_digest(stage, run_id="latest"):
+    """Hash of one run's values (run_id and run_time left out), or None: equal for runs with the same results."""
+    run = load_run(stage, run_id)
+    if run is None:
+        return None
+    values = {t: [{k: v for k, v in row.items() if k not in ("run_id", "run_time")} for row in rows]
+              for t, rows in run.items()}
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def lookup(rows, value_col, **where):
+    """value_col of the first row matching every where-field (e.g. model=..., term=...), or None."""
+    for row in rows:
+        if all(row[k] == v for k, v in where.items()):
+            return row[value_col]
+    return None
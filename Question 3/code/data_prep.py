@@ -1,11 +1,39 @@
 from __future__ import annotations
 
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import StringIO
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
-import requests
-import yfinance as yf
+
+import q2_path  # noqa: F401 - puts Question 2 on sys.path; must precede the q2_* imports
+from q2_fixtures import FixtureStore
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import requests
+
+# requests, yfinance and pyarrow are imported where they are used, so cached / replayed runs never load the
+# first two and importing this module stays cheap.
+
+
+# Record / replay of network responses (FRED and Yahoo), for reproducible offline timing runs:
+# "live" (default) fetches normally, "record" also saves every response under FIXTURE_DIR,
+# "replay" serves the saved responses without touching the network (a missing one is an error).
+DATA_MODE = os.environ.get("Q3_DATA_MODE", "live")
+FIXTURE_DIR = Path(os.environ.get("Q3_FIXTURE_DIR") or Path(__file__).resolve().parents[1] / "data" / "fixtures")
+_FIXTURES = FixtureStore(DATA_MODE, FIXTURE_DIR, "Q3_DATA_MODE")
+
+
+def _http_get(url: str, session: requests.Session | None = None, timeout: float = 30):
+    return _FIXTURES.http_get(url, timeout=timeout, session=session)
+
+
+def _yf_download(ticker: str, **kwargs) -> pd.DataFrame:
+    return _FIXTURES.yf_download(ticker, **kwargs)
 
 
 def load_fund_monthly_returns(xlsx_path: Path) -> pd.DataFrame:
@@ -18,28 +46,97 @@ def load_fund_monthly_returns(xlsx_path: Path) -> pd.DataFrame:
     return df
 
 
-def load_ff5_monthly(parquet_path: Path) -> pd.DataFrame:
-    ff = pd.read_parquet(parquet_path)
-    ff["dt"] = pd.to_datetime(ff["dt"])
-    ff["month"] = ff["dt"].dt.to_period("M").dt.to_timestamp("M")
-    factor_cols = ["mkt_rf", "smb", "hml", "rmw", "cma", "rf"]
-    for col in factor_cols:
-        ff[col] = pd.to_numeric(ff[col], errors="coerce")
-
-    ff_monthly = (
-        ff.groupby("month")[factor_cols]
-        .apply(lambda x: (1.0 + x).prod() - 1.0)
-        .reset_index()
-        .rename(columns={"month": "date"})
-        .sort_values("date")
-        .reset_index(drop=True)
-    )
-    return ff_monthly
+def compound_returns(df: pd.DataFrame, date_col: str, cols: list[str], freq: str = "M") -> pd.DataFrame:
+    # Compound simple returns within weekly ("W"), monthly ("M") or quarterly ("Q") buckets in one vectorized
+    # pass: sort by date, find bucket boundaries, then expm1 of np.add.reduceat over log1p returns.
+    # Missing values count as a zero return, like (1 + x).prod() with skipna. Output "date" is the bucket end.
+    if not df[date_col].is_monotonic_increasing:
+        df = df.sort_values(date_col, kind="stable")
+    periods = pd.PeriodIndex(df[date_col], freq=freq)
+    ordinals = periods.asi8
+    starts = np.flatnonzero(np.r_[True, ordinals[1:] != ordinals[:-1]])
+    logs = np.log1p(df[cols].to_numpy(dtype="float64"))
+    logs[np.isnan(logs)] = 0.0
+    sums = np.add.reduceat(logs, starts, axis=0) if len(starts) else logs[:0]
+    out = pd.DataFrame(np.expm1(sums), columns=cols)
+    out.insert(0, "date", periods[starts].to_timestamp(how="end").normalize())
+    return out
+
+
+FF5_FACTOR_COLS = ["mkt_rf", "smb", "hml", "rmw", "cma", "rf"]
 
 
-def _fetch_fred_csv(series_id: str) -> pd.DataFrame:
-    url = f"https://fred.stlouisfed.org/graph/fredgraph.csv?id={series_id}"
-    r = requests.get(url, timeout=30)
+def _date_filter_value(dt_type: pa.DataType, value: str):
+    # Express a date bound in the file's own type so the filter can be checked against row-group statistics.
+    import pyarrow as pa
+
+    if pa.types.is_string(dt_type) or pa.types.is_large_string(dt_type):
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    return pa.scalar(pd.Timestamp(value).to_pydatetime(), type=pa.timestamp("us")).cast(dt_type)
+
+
+def read_factor_parquet(
+    parquet_path: Path,
+    factor_cols: list[str] | None = None,
+    start: str | None = None,
+    end: str | None = None,
+) -> pd.DataFrame:
+    # Arrow read of a daily factor file: only `dt` plus the requested columns are read, row groups outside
+    # [start, end] are skipped via predicate pushdown, and the file is memory-mapped. Value dtypes come
+    # from the parquet schema; only `dt` is cast (string -> date) inside Arrow.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    factor_cols = factor_cols or FF5_FACTOR_COLS
+    dt_type = pq.read_schema(parquet_path, memory_map=True).field("dt").type
+    filters = []
+    if start is not None:
+        filters.append(("dt", ">=", _date_filter_value(dt_type, start)))
+    if end is not None:
+        filters.append(("dt", "<=", _date_filter_value(dt_type, end)))
+    table = pq.read_table(
+        parquet_path, columns=["dt"] + factor_cols, filters=filters or None, memory_map=True,
+    )
+    if not pa.types.is_timestamp(dt_type):
+        table = table.set_column(0, "dt", table.column("dt").cast(pa.date32()).cast(pa.timestamp("us")))
+    return table.to_pandas()
+
+
+def load_ff5_monthly(
+    parquet_path: Path,
+    start: str | None = None,
+    end: str | None = None,
+    factor_cols: list[str] | None = None,
+) -> pd.DataFrame:
+    factor_cols = factor_cols or FF5_FACTOR_COLS
+    ff = read_factor_parquet(parquet_path, factor_cols, start=start, end=end)
+    return compound_returns(ff, "dt", factor_cols, freq="M")
+
+
+FRED_URL = "https://fred.stlouisfed.org/graph/fredgraph.csv?id={series_id}"
+# Macro candidates pulled from FRED: (series id, output column, transform).
+# "pct" is the month-end level's percent change; "diff_pct" is the change of a series quoted in percent, as a decimal.
+FRED_SERIES: list[tuple[str, str, str]] = [
+    ("DTWEXBGS", "usd_ret", "pct"),
+    ("DGS10", "dgs10_chg", "diff_pct"),
+    ("BAMLH0A0HYM2", "hy_oas_chg", "diff_pct"),
+]
+FRED_MAX_WORKERS = 8
+
+
+def _fred_session(pool_size: int = FRED_MAX_WORKERS) -> requests.Session:
+    # One keep-alive connection pool shared by every worker thread.
+    import requests
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=2)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _fetch_fred_csv(series_id: str, session: requests.Session | None = None, timeout: float = 30) -> pd.DataFrame:
+    r = _http_get(FRED_URL.format(series_id=series_id), session=session, timeout=timeout)
     r.raise_for_status()
     out = pd.read_csv(StringIO(r.text))
     out.columns = ["date", series_id]
@@ -49,58 +146,80 @@ def _fetch_fred_csv(series_id: str) -> pd.DataFrame:
     return out
 
 
-def fetch_external_factors(start: str = "2002-01-01") -> pd.DataFrame:
-    # Macro proxies: USD level, 10Y Treasury yield, high-yield OAS, commodity index.
-    usd = _fetch_fred_csv("DTWEXBGS")
-    dgs10 = _fetch_fred_csv("DGS10")
-    hy_oas = _fetch_fred_csv("BAMLH0A0HYM2")
-
-    usd["date"] = usd["date"].dt.to_period("M").dt.to_timestamp("M")
-    dgs10["date"] = dgs10["date"].dt.to_period("M").dt.to_timestamp("M")
-    hy_oas["date"] = hy_oas["date"].dt.to_period("M").dt.to_timestamp("M")
-
-    usd_monthly = usd.groupby("date", as_index=False)["DTWEXBGS"].last()
-    dgs10_monthly = dgs10.groupby("date", as_index=False)["DGS10"].last()
-    hy_monthly = hy_oas.groupby("date", as_index=False)["BAMLH0A0HYM2"].last()
-
-    usd_monthly["usd_ret"] = usd_monthly["DTWEXBGS"].pct_change()
-    dgs10_monthly["dgs10_chg"] = dgs10_monthly["DGS10"].diff() / 100.0
-    hy_monthly["hy_oas_chg"] = hy_monthly["BAMLH0A0HYM2"].diff() / 100.0
-
-    # Commodity proxy from Yahoo; fallback leaves cmdty_ret as missing.
-    cmdty = pd.DataFrame(columns=["date", "cmdty_ret"])
-    try:
-        c = yf.download("^SPGSCI", start=start, auto_adjust=True, progress=False)
-        if not c.empty:
-            if isinstance(c.columns, pd.MultiIndex):
-                close = c["Close"].iloc[:, 0]
-            else:
-                close = c["Close"]
-            close = close.rename("close").to_frame()
-            close.index = pd.to_datetime(close.index)
-            close["date"] = close.index.to_period("M").to_timestamp("M")
-            cmdty = (
-                close.groupby("date", as_index=False)["close"].last().assign(
-                    cmdty_ret=lambda x: x["close"].pct_change()
-                )[["date", "cmdty_ret"]]
-            )
-    except Exception:
-        pass
+def _fred_monthly_factor(
+    series_id: str, col: str, transform: str, session: requests.Session | None = None
+) -> pd.DataFrame:
+    raw = _fetch_fred_csv(series_id, session=session)
+    raw["date"] = raw["date"].dt.to_period("M").dt.to_timestamp("M")
+    monthly = raw.groupby("date", as_index=False)[series_id].last()
+    if transform == "pct":
+        monthly[col] = monthly[series_id].pct_change()
+    elif transform == "diff_pct":
+        monthly[col] = monthly[series_id].diff() / 100.0
+    else:
+        raise ValueError(f"unknown FRED transform {transform!r} for {series_id}")
+    return monthly[["date", col]]
 
-    out = (
-        usd_monthly[["date", "usd_ret"]]
-        .merge(dgs10_monthly[["date", "dgs10_chg"]], on="date", how="outer")
-        .merge(hy_monthly[["date", "hy_oas_chg"]], on="date", how="outer")
-        .merge(cmdty, on="date", how="outer")
-        .sort_values("date")
-        .reset_index(drop=True)
-    )
-    out = out[out["date"] >= pd.Timestamp(start)]
+
+def _commodity_monthly(start: str) -> pd.DataFrame:
+    c = _yf_download("^SPGSCI", start=start, auto_adjust=True, progress=False)
+    if c.empty:
+        raise ValueError("no ^SPGSCI data returned")
+    if isinstance(c.columns, pd.MultiIndex):
+        close = c["Close"].iloc[:, 0]
+    else:
+        close = c["Close"]
+    close = close.rename("close").to_frame()
+    close.index = pd.to_datetime(close.index)
+    close["date"] = close.index.to_period("M").to_timestamp("M")
+    return close.groupby("date", as_index=False)["close"].last().assign(
+        cmdty_ret=lambda x: x["close"].pct_change()
+    )[["date", "cmdty_ret"]]
+
+
+def fetch_external_factors(
+    start: str = "2002-01-01",
+    series: list[tuple[str, str, str]] | None = None,
+    max_workers: int = FRED_MAX_WORKERS,
+) -> pd.DataFrame:
+    # Macro proxies: FRED series (USD level, 10Y Treasury yield, high-yield OAS by default) plus a commodity index.
+    # All downloads run concurrently; a failed series is left out and recorded in out.attrs["fetch_errors"]
+    # as {column: "ErrorType: message"}. Only when every download fails is an exception raised.
+    series = FRED_SERIES if series is None else series
+    frames: dict[str, pd.DataFrame] = {}
+    errors: dict[str, str] = {}
+    with _fred_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_fred_monthly_factor, series_id, col, transform, session): col
+            for series_id, col, transform in series
+        }
+        futures[pool.submit(_commodity_monthly, start)] = "cmdty_ret"
+        for fut in as_completed(futures):
+            col = futures[fut]
+            try:
+                frames[col] = fut.result()
+            except Exception as e:
+                errors[col] = f"{type(e).__name__}: {e}"
+
+    if not frames:
+        detail = "; ".join(f"{col}: {msg}" for col, msg in errors.items())
+        raise RuntimeError(f"all external factor downloads failed ({detail})")
+
+    # Merge (and report) in configuration order so the output is stable regardless of completion order.
+    cols = [col for _, col, _ in series] + ["cmdty_ret"]
+    errors = {col: errors[col] for col in cols if col in errors}
+    out = None
+    for col in cols:
+        if col in frames:
+            out = frames[col] if out is None else out.merge(frames[col], on="date", how="outer")
+    out = out.sort_values("date").reset_index(drop=True)
+    out = out[out["date"] >= pd.Timestamp(start)].reset_index(drop=True)
+    out.attrs["fetch_errors"] = errors
     return out
 
 
 def fetch_hfgm_monthly_returns(start: str = "2022-01-01") -> pd.DataFrame:
-    h = yf.download("HFGM", start=start, auto_adjust=True, progress=False)
+    h = _yf_download("HFGM", start=start, auto_adjust=True, progress=False)
     if h.empty:
         return pd.DataFrame(columns=["date", "hfgm_ret"])
     if isinstance(h.columns, pd.MultiIndex):
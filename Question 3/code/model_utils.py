@@ -1,21 +1,96 @@
 from __future__ import annotations
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 
+import q2_path  # noqa: F401 - puts Question 2 on sys.path; must precede the q2_* imports
+import q2_bootstrap
+import q2_ols
+from q2_asset_pricing import grs_test  # noqa: F401 - re-exported for run_analysis
+
+# statsmodels and scipy.stats are imported inside the functions that need them: they dominate import time,
+# and the batched routines below (and the subset-search workers) only use NumPy.
+
+COV_TYPES = ("nonrobust", "HC0", "HC1", "HC2", "HC3", "HAC")
+
+
+def newey_west_lags(n_obs: int) -> int:
+    # Automatic Newey-West lag length: floor(4 (n/100)^(2/9)).
+    return int(np.floor(4.0 * (n_obs / 100.0) ** (2.0 / 9.0)))
+
+
+def fit_ols(y: pd.Series, x: pd.DataFrame, cov_type: str = "nonrobust", maxlags: int | None = None):
+    # cov_type: "nonrobust", "HC0"-"HC3" (heteroskedasticity-robust) or "HAC" (Newey-West, Bartlett kernel);
+    # HAC uses maxlags, or newey_west_lags of the sample size after dropping missing rows.
+    if cov_type not in COV_TYPES:
+        raise ValueError(f"cov_type must be one of {', '.join(COV_TYPES)}, not {cov_type!r}")
+    import statsmodels.api as sm
 
-def fit_ols(y: pd.Series, x: pd.DataFrame):
     x_with_const = sm.add_constant(x, has_constant="add")
-    model = sm.OLS(y, x_with_const, missing="drop").fit()
+    cov_kwds = None
+    if cov_type == "HAC":
+        n_obs = int((y.notna() & x_with_const.notna().all(axis=1)).sum())
+        cov_kwds = {"maxlags": newey_west_lags(n_obs) if maxlags is None else maxlags}
+    model = sm.OLS(y, x_with_const, missing="drop").fit(cov_type=cov_type, cov_kwds=cov_kwds)
     return model
 
 
-def regression_diagnostics(model, y: pd.Series, x: pd.DataFrame) -> dict:
-    x_with_const = sm.add_constant(x, has_constant="add")
-    y_hat = model.predict(x_with_const)
-    resid = y - y_hat
-    return {
+def _with_const(x: pd.DataFrame | pd.Series) -> pd.DataFrame:
+    # const + x, as sm.add_constant(x, has_constant="add").
+    out = x.to_frame() if isinstance(x, pd.Series) else x.copy()
+    out.insert(0, "const", 1.0)
+    return out
+
+
+def rolling_ols(
+    y: pd.Series,
+    x: pd.DataFrame,
+    window: int | None = None,
+    min_nobs: int | None = None,
+    cov_type: str = "nonrobust",
+    maxlags: int | None = None,
+) -> pd.DataFrame:
+    # Rolling (window rows) or expanding (window=None) OLS of y on const + x, via q2_ols.rolling_ols (running
+    # X'X / X'y sums, no refits). Rows with missing values are skipped; a window needs at least min_nobs
+    # (default k + 1) complete rows. One row per observation: coefficients, t-stats (t_<term>) under cov_type,
+    # r2, adj_r2, n_obs.
+    x_with_const = _with_const(x).set_axis(y.index)
+    out = q2_ols.rolling_ols(y, x_with_const, window=window, min_nobs=min_nobs, cov_type=cov_type, maxlags=maxlags)
+    return out.rename(columns={"rsquared": "r2", "rsquared_adj": "adj_r2", "nobs": "n_obs"})
+
+
+def bootstrap_ols(
+    y: pd.Series,
+    x: pd.DataFrame,
+    n_boot: int = 10000,
+    block: int | None = None,
+    method: str = "stationary",
+    level: float = 0.95,
+    seed: int = 0,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    # Block bootstrap of OLS y ~ const + x via q2_bootstrap.block_bootstrap (all resamples fitted as batched
+    # matrix products; see there for the process-pool rule). One row per term (coefficients, alpha_annualized,
+    # r2): estimate, bootstrap s.e., percentile and BCa intervals. block defaults to n^(1/3).
+    out = q2_bootstrap.block_bootstrap(
+        y, _with_const(x), n_boot=n_boot, block=block, method=method, level=level, seed=seed, workers=workers
+    )
+    out = out.rename(index={"alpha_ann": "alpha_annualized", "rsquared": "r2"}).rename_axis("term").reset_index()
+    out.attrs = {key: out.attrs[key] for key in ("n_boot", "block", "method", "level")}
+    return out
+
+
+def regression_diagnostics(model, boot: pd.DataFrame | None = None) -> dict:
+    # Everything comes from the fitted results (residuals and fitted values are already held by the fit).
+    # boot: optional bootstrap_ols output; adds the BCa interval for the annualized alpha.
+    resid = np.asarray(model.resid, dtype="float64")
+    y_hat = np.asarray(model.fittedvalues, dtype="float64")
+    y = y_hat + resid
+    out = {
         "n_obs": int(model.nobs),
         "r2": float(model.rsquared),
         "adj_r2": float(model.rsquared_adj),
@@ -25,6 +100,11 @@ def regression_diagnostics(model, y: pd.Series, x: pd.DataFrame) -> dict:
         "resid_vol_annualized": float(resid.std(ddof=1) * np.sqrt(12.0)),
         "corr_fitted_actual": float(np.corrcoef(y, y_hat)[0, 1]),
     }
+    if boot is not None:
+        alpha_row = boot.set_index("term").loc["alpha_annualized"]
+        out["alpha_annualized_bca_low"] = float(alpha_row["bca_low"])
+        out["alpha_annualized_bca_high"] = float(alpha_row["bca_high"])
+    return out
 
 
 def coef_table(model) -> pd.DataFrame:
@@ -60,3 +140,124 @@ def compare_two_models(model_a_name: str, diag_a: dict, model_b_name: str, diag_
         },
     ]
     return pd.DataFrame(rows)
+
+
+SUBSET_CHUNK = 20000  # subsets per pool task
+SUBSET_POOL_MIN = 100_000  # fewer subsets than this are solved in-process (~10 us each, so pool start-up would dominate)
+
+
+def _subset_chunk(gram: np.ndarray, fold_grams: np.ndarray, n_obs: int, subsets: np.ndarray) -> np.ndarray:
+    # gram: [const, candidates..., y] cross-products over one sample; subsets: (B, s) candidate positions.
+    # Every subset's X'X and X'y are sub-blocks of the same Gram matrix, so all B fits are one batched solve;
+    # k-fold errors reuse the fold Grams (train = total - fold). Returns [ssr, tss, cv_sse] per subset.
+    y_pos = gram.shape[0] - 1
+    idx = np.hstack([np.zeros((len(subsets), 1), dtype=int), subsets + 1])
+
+    def solve(a: np.ndarray, c: np.ndarray) -> np.ndarray:
+        try:
+            return np.linalg.solve(a, c[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            return np.einsum("bij,bj->bi", np.linalg.pinv(a, hermitian=True), c)
+
+    def blocks(g: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        return g[idx[:, :, None], idx[:, None, :]], g[idx, y_pos]
+
+    a, c = blocks(gram)
+    b = solve(a, c)
+    yty = gram[y_pos, y_pos]
+    ssr = yty - np.einsum("bi,bi->b", b, c)
+    tss = np.full(len(subsets), yty - gram[0, y_pos] ** 2 / n_obs)
+    cv_sse = np.zeros(len(subsets))
+    for fg in fold_grams:
+        af, cf = blocks(fg)
+        bf = solve(a - af, c - cf)
+        cv_sse += fg[y_pos, y_pos] - 2.0 * np.einsum("bi,bi->b", bf, cf) + np.einsum("bi,bij,bj->b", bf, af, bf)
+    return np.column_stack([ssr, tss, cv_sse])
+
+
+def subset_search(
+    y: pd.Series,
+    x: pd.DataFrame,
+    min_size: int = 3,
+    max_size: int = 5,
+    min_obs: int = 60,
+    folds: int = 5,
+    common_sample: bool = True,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    # Exhaustive search over all min_size..max_size subsets of the columns of x (each model: y ~ const + subset).
+    # common_sample=True fits every subset on the months where y and all candidates are observed, so the
+    # criteria are comparable; otherwise each subset uses its own dropna() sample (AIC/BIC then favour short
+    # samples). Subsets with fewer than min_obs months are skipped. Subsets that share a sample share one Gram
+    # matrix, and each chunk of subsets is solved in one batch; workers=None uses a process pool only for
+    # searches of at least SUBSET_POOL_MIN subsets. cv_rmse is the out-of-sample error
+    # from `folds` contiguous (time-ordered) folds. Sorted by BIC; rank_* columns give the other orderings.
+    names = list(x.columns)
+    yv = y.to_numpy(dtype="float64")
+    xv = x.to_numpy(dtype="float64")
+    y_ok = np.isfinite(yv)
+    col_ok = np.isfinite(xv)
+    if common_sample:
+        col_ok[:] = col_ok.all(axis=1, keepdims=True)
+
+    # Columns with identical availability share a pattern; a subset's sample is fixed by the patterns it uses.
+    patterns, col_pattern = np.unique(col_ok.T, axis=0, return_inverse=True)
+    col_pattern = col_pattern.reshape(-1)
+    z = np.column_stack([np.ones(len(yv)), np.nan_to_num(xv), np.nan_to_num(yv)])
+
+    tasks = []
+    for size in range(min_size, min(max_size, len(names)) + 1):
+        subsets = np.array(list(combinations(range(len(names)), size)), dtype=int)
+        uses = np.zeros((len(subsets), len(patterns)), dtype=bool)
+        uses[np.arange(len(subsets))[:, None], col_pattern[subsets]] = True
+        groups, group_of = np.unique(uses, axis=0, return_inverse=True)
+        group_of = group_of.reshape(-1)
+        for g, used in enumerate(groups):
+            members = subsets[group_of == g]
+            rows = y_ok & patterns[used].all(axis=0)
+            n_obs = int(rows.sum())
+            if n_obs < max(min_obs, size + 1 + folds):
+                continue
+            zr = z[rows]
+            gram = zr.T @ zr
+            fold_grams = np.stack([zf.T @ zf for zf in np.array_split(zr, folds)])
+            for start in range(0, len(members), SUBSET_CHUNK):
+                tasks.append((gram, fold_grams, n_obs, members[start : start + SUBSET_CHUNK]))
+
+    columns = ["factors", "n_factors", "n_obs", "r2", "adj_r2", "aic", "bic", "cv_rmse"]
+    if not tasks:
+        return pd.DataFrame(columns=columns)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if sum(len(t[3]) for t in tasks) >= SUBSET_POOL_MIN else 1
+    workers = min(workers, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fits = list(pool.map(_subset_chunk, *zip(*tasks)))
+    else:
+        fits = [_subset_chunk(*t) for t in tasks]
+
+    res = np.vstack(fits)
+    subsets = [t[3] for t in tasks]
+    k = np.concatenate([np.full(len(m), m.shape[1]) for m in subsets])
+    n = np.concatenate([np.full(len(m), t[2]) for m, t in zip(subsets, tasks)]).astype("float64")
+    ssr, tss, cv_sse = res.T
+    # Gaussian log-likelihood as in statsmodels OLS; parameter count includes the constant.
+    llf = -0.5 * n * (np.log(2.0 * np.pi) + np.log(ssr / n) + 1.0)
+    out = pd.DataFrame(
+        {
+            "factors": [", ".join(str(names[j]) for j in row) for m in subsets for row in m],
+            "n_factors": k,
+            "n_obs": n.astype(int),
+            "r2": 1.0 - ssr / tss,
+            "adj_r2": 1.0 - (ssr / (n - k - 1.0)) / (tss / (n - 1.0)),
+            "aic": -2.0 * llf + 2.0 * (k + 1),
+            "bic": -2.0 * llf + np.log(n) * (k + 1),
+            "cv_rmse": np.sqrt(cv_sse / n),
+        }
+    )
+    out = out.sort_values("bic", kind="mergesort").reset_index(drop=True)
+    out["rank_adj_r2"] = out["adj_r2"].rank(ascending=False, method="min").astype(int)
+    out["rank_aic"] = out["aic"].rank(method="min").astype(int)
+    out["rank_bic"] = out["bic"].rank(method="min").astype(int)
+    out["rank_cv"] = out["cv_rmse"].rank(method="min").astype(int)
+    return out
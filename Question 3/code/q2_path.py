@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Question 3 shares Question 2's config-free modules (the NumPy estimation engines and the record/replay
+# fixture layer) instead of copying them; importing this module puts that folder on sys.path.
+Q2_DIR = Path(__file__).resolve().parents[2] / "Question 2"
+if str(Q2_DIR) not in sys.path:
+    sys.path.append(str(Q2_DIR))
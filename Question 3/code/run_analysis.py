@@ -6,12 +6,22 @@ import numpy as np
 import pandas as pd
 
 from data_prep import (
+    FRED_SERIES,
     fetch_external_factors,
     fetch_hfgm_monthly_returns,
     load_ff5_monthly,
     load_fund_monthly_returns,
 )
-from model_utils import coef_table, compare_two_models, fit_ols, regression_diagnostics
+from model_utils import (
+    bootstrap_ols,
+    coef_table,
+    compare_two_models,
+    fit_ols,
+    grs_test,
+    regression_diagnostics,
+    rolling_ols,
+    subset_search,
+)
 
 
 CODE_DIR = Path(__file__).resolve().parent
@@ -19,6 +29,16 @@ PROJECT_DIR = CODE_DIR.parent
 DATA_DIR = PROJECT_DIR / "data"
 OUTPUT_MD = CODE_DIR / "analysis_global_macro.md"
 OUTPUT_DATA = DATA_DIR
+ROLLING_WINDOW_MONTHS = 36
+# Standard errors for the full-sample regressions: "nonrobust" (default), "HC0"-"HC3", or "HAC" (Newey-West,
+# automatic lag length).
+COV_TYPE = "nonrobust"
+# Stationary block bootstrap (block length n^(1/3)) for percentile/BCa intervals on alpha, betas and R².
+BOOTSTRAP_RESAMPLES = 10000
+BOOTSTRAP_SEED = 7037
+# Macro model: best subset (by BIC) of MACRO_MIN_FACTORS..MACRO_MAX_FACTORS candidates, all fitted on one sample.
+MACRO_MIN_FACTORS = 3
+MACRO_MAX_FACTORS = 5
 
 
 def _resolve_input_file(filename: str) -> Path:
@@ -38,6 +58,30 @@ def _load_external_factors_csv(csv_path: Path) -> pd.DataFrame:
     return ext
 
 
+def _rolling_betas(dates: pd.Series, y: pd.Series, x: pd.DataFrame) -> pd.DataFrame:
+    out = rolling_ols(
+        y.reset_index(drop=True), x.reset_index(drop=True),
+        window=ROLLING_WINDOW_MONTHS, min_nobs=ROLLING_WINDOW_MONTHS,
+    )
+    out.insert(0, "date", dates.reset_index(drop=True))
+    return out.dropna(subset=["const"]).reset_index(drop=True)
+
+
+def _rolling_summary(rolling: pd.DataFrame, terms: list[str]) -> pd.DataFrame:
+    # Range of the rolling estimates per term, plus the latest window.
+    rows = [
+        {
+            "factor": t,
+            "min": rolling[t].min(),
+            "median": rolling[t].median(),
+            "max": rolling[t].max(),
+            "latest": rolling[t].iloc[-1],
+        }
+        for t in terms
+    ]
+    return pd.DataFrame(rows)
+
+
 def to_md_table(df: pd.DataFrame, digits: int = 4) -> str:
     data = df.copy()
     for c in data.columns:
@@ -59,14 +103,20 @@ def main():
 
     # 1) Load local data
     fund = load_fund_monthly_returns(fund_xlsx)
-    ff5 = load_ff5_monthly(ff5_parquet)
+    # Only daily factor rows inside the fund's sample are read from the parquet file.
+    ff5 = load_ff5_monthly(
+        ff5_parquet,
+        start=str(fund["date"].min().to_period("M").start_time.date()),
+        end=str(fund["date"].max().date()),
+    )
     core = fund.merge(ff5, on="date", how="inner").sort_values("date").reset_index(drop=True)
     core["fund_excess"] = core["fund_ret"] - core["rf"]
 
     # 2) Baseline FF5 model
     ff5_factors = ["mkt_rf", "smb", "hml", "rmw", "cma"]
-    ff5_model = fit_ols(core["fund_excess"], core[ff5_factors])
-    ff5_diag = regression_diagnostics(ff5_model, core["fund_excess"], core[ff5_factors])
+    ff5_model = fit_ols(core["fund_excess"], core[ff5_factors], cov_type=COV_TYPE)
+    ff5_boot = bootstrap_ols(core["fund_excess"], core[ff5_factors], n_boot=BOOTSTRAP_RESAMPLES, seed=BOOTSTRAP_SEED)
+    ff5_diag = regression_diagnostics(ff5_model, boot=ff5_boot)
     ff5_coef = coef_table(ff5_model).reset_index().rename(columns={"index": "factor"})
 
     # 3) External macro factors (with fallback)
@@ -74,6 +124,23 @@ def main():
     external_factors_file = OUTPUT_DATA / "external_factors_monthly.csv"
     try:
         ext = fetch_external_factors(start=str(core["date"].min().date()))
+        fetch_errors = ext.attrs.get("fetch_errors", {})
+        if fetch_errors:
+            # Partial failure: keep the series that did download and take the missing ones from the last saved file.
+            failed = ", ".join(f"{col} ({msg})" for col, msg in fetch_errors.items())
+            recovered = []
+            if external_factors_file.exists():
+                try:
+                    saved = _load_external_factors_csv(external_factors_file)
+                    recovered = [c for c in fetch_errors if c in saved.columns]
+                    if recovered:
+                        ext = ext.merge(saved[["date"] + recovered], on="date", how="outer")
+                        ext = ext.sort_values("date").reset_index(drop=True)
+                except Exception:
+                    recovered = []
+            fallback_note = f"Some external series failed to download: {failed}."
+            if recovered:
+                fallback_note += f" Used {external_factors_file.name} for: {', '.join(recovered)}."
         ext.to_csv(external_factors_file, index=False)
     except Exception as e:
         if external_factors_file.exists():
@@ -103,29 +170,38 @@ def main():
     macro = core.merge(ext, on="date", how="left").merge(local_proxy, on="date", how="left")
     macro["fund_excess"] = macro["fund_ret"] - macro["rf"]
 
-    candidate_order = ["mkt_rf", "usd_ret", "dgs10_chg", "hy_oas_chg", "cmdty_ret", "equity_style_spread"]
+    candidate_order = ["mkt_rf"] + [col for _, col, _ in FRED_SERIES] + ["cmdty_ret", "equity_style_spread"]
     available = [c for c in candidate_order if c in macro.columns and macro[c].notna().sum() > 60]
 
-    # Keep model simple: 3-5 factors (prefer first 5 available).
-    if len(available) >= 5:
-        macro_factors = available[:5]
-    elif len(available) >= 3:
-        macro_factors = available[:]
+    # Keep model simple: 3-5 factors, chosen by BIC over every subset of the available candidates
+    # (append a column to `candidate_order` to include it in the search).
+    subset_tbl = subset_search(
+        macro["fund_excess"], macro[available], min_size=MACRO_MIN_FACTORS, max_size=MACRO_MAX_FACTORS
+    )
+    if not subset_tbl.empty:
+        macro_factors = subset_tbl.loc[0, "factors"].split(", ")
     else:
         macro_factors = ["mkt_rf", "smb", "hml"]
 
     macro_df = macro[["date", "fund_excess"] + macro_factors].dropna().reset_index(drop=True)
-    macro_model = fit_ols(macro_df["fund_excess"], macro_df[macro_factors])
-    macro_diag = regression_diagnostics(macro_model, macro_df["fund_excess"], macro_df[macro_factors])
+    macro_model = fit_ols(macro_df["fund_excess"], macro_df[macro_factors], cov_type=COV_TYPE)
+    macro_boot = bootstrap_ols(
+        macro_df["fund_excess"], macro_df[macro_factors], n_boot=BOOTSTRAP_RESAMPLES, seed=BOOTSTRAP_SEED
+    )
+    macro_diag = regression_diagnostics(macro_model, boot=macro_boot)
     macro_coef = coef_table(macro_model).reset_index().rename(columns={"index": "factor"})
 
     # Fair comparison against FF5 over macro sample window.
     same_window = core[core["date"].isin(macro_df["date"])].dropna(subset=["fund_excess"] + ff5_factors)
-    ff5_same_model = fit_ols(same_window["fund_excess"], same_window[ff5_factors])
-    ff5_same_diag = regression_diagnostics(ff5_same_model, same_window["fund_excess"], same_window[ff5_factors])
+    ff5_same_model = fit_ols(same_window["fund_excess"], same_window[ff5_factors], cov_type=COV_TYPE)
+    ff5_same_diag = regression_diagnostics(ff5_same_model)
 
     compare_tbl = compare_two_models("FF5 (same window)", ff5_same_diag, "Proposed Macro Model", macro_diag)
 
+    # Rolling exposures (trailing ROLLING_WINDOW_MONTHS months, updated incrementally per month).
+    ff5_rolling = _rolling_betas(core["date"], core["fund_excess"], core[ff5_factors])
+    macro_rolling = _rolling_betas(macro_df["date"], macro_df["fund_excess"], macro_df[macro_factors])
+
     # 4) Extra credit: backtest vs live HFGM
     live_note = ""
     live_stats = pd.DataFrame()
@@ -133,24 +209,29 @@ def main():
     try:
         hfgm = fetch_hfgm_monthly_returns(start="2022-01-01")
         hfgm.to_csv(OUTPUT_DATA / "hfgm_monthly_returns.csv", index=False)
-        live = core[["date", "fund_ret"]].merge(hfgm, on="date", how="inner").dropna()
+        live = core[["date", "fund_ret", "rf"] + ff5_factors].merge(hfgm, on="date", how="inner").dropna()
         if len(live) >= 4:
             corr = float(live["fund_ret"].corr(live["hfgm_ret"]))
             beta = float(np.cov(live["hfgm_ret"], live["fund_ret"], ddof=1)[0, 1] / np.var(live["fund_ret"], ddof=1))
             spread = live["hfgm_ret"] - live["fund_ret"]
             te_ann = float(spread.std(ddof=1) * np.sqrt(12.0))
             mean_diff_ann = float(((1.0 + spread.mean()) ** 12) - 1.0)
-            live_stats = pd.DataFrame(
-                [
-                    {
-                        "overlap_months": len(live),
-                        "corr_hfgm_vs_backtest": corr,
-                        "beta_hfgm_on_backtest": beta,
-                        "tracking_error_ann": te_ann,
-                        "avg_return_diff_ann": mean_diff_ann,
-                    }
-                ]
-            )
+            row = {
+                "overlap_months": len(live),
+                "corr_hfgm_vs_backtest": corr,
+                "beta_hfgm_on_backtest": beta,
+                "tracking_error_ann": te_ann,
+                "avg_return_diff_ann": mean_diff_ann,
+            }
+            # Joint test that the backtest and HFGM both have zero FF5 alpha over the overlap.
+            if len(live) > 2 + len(ff5_factors):
+                excess = pd.DataFrame(
+                    {"backtest": live["fund_ret"] - live["rf"], "hfgm": live["hfgm_ret"] - live["rf"]}
+                )
+                grs = grs_test(excess, live[ff5_factors])
+                row["grs_ff5_alpha"] = grs.stat
+                row["grs_pvalue"] = grs.pvalue
+            live_stats = pd.DataFrame([row])
             live_overlap = live.copy()
             live_overlap["spread_hfgm_minus_backtest"] = live_overlap["hfgm_ret"] - live_overlap["fund_ret"]
             live_overlap["date"] = live_overlap["date"].dt.strftime("%Y-%m")
@@ -163,12 +244,18 @@ def main():
     ff5_coef.to_csv(CODE_DIR / "ff5_coefficients.csv", index=False)
     macro_coef.to_csv(CODE_DIR / "macro_model_coefficients.csv", index=False)
     compare_tbl.to_csv(CODE_DIR / "model_comparison.csv", index=False)
+    ff5_boot.to_csv(CODE_DIR / "ff5_bootstrap_ci.csv", index=False)
+    macro_boot.to_csv(CODE_DIR / "macro_bootstrap_ci.csv", index=False)
+    subset_tbl.to_csv(CODE_DIR / "macro_subset_search.csv", index=False)
+    ff5_rolling.to_csv(CODE_DIR / "ff5_rolling_betas.csv", index=False)
+    macro_rolling.to_csv(CODE_DIR / "macro_rolling_betas.csv", index=False)
     if not live_stats.empty:
         live_stats.to_csv(CODE_DIR / "live_vs_backtest_stats.csv", index=False)
 
     # 5) Build markdown report
     ff5_alpha_p = float(ff5_model.pvalues.get("const", np.nan))
     ff5_alpha_sig = "statistically significant" if ff5_alpha_p < 0.05 else "not statistically significant"
+    se_note = "" if COV_TYPE == "nonrobust" else f"; {COV_TYPE} standard errors, as for all t-stats and p-values below"
     fit_delta = macro_diag["adj_r2"] - ff5_same_diag["adj_r2"]
 
     report = f"""# CS Global Macro Index (2x Vol, Net 95bps): Factor Exposure Analysis
@@ -194,7 +281,8 @@ So FF5 is a good **diagnostic benchmark** (to test equity-style dependence), but
 
 {to_md_table(pd.DataFrame([ff5_diag]))}
 
-Alpha under FF5 is **{ff5_alpha_sig}** at the 5% level (p-value = {ff5_alpha_p:.4f}).
+Alpha under FF5 is **{ff5_alpha_sig}** at the 5% level (p-value = {ff5_alpha_p:.4f}{se_note}).
+Block-bootstrap {ff5_boot.attrs["level"]:.0%} BCa interval for annualized alpha: [{ff5_diag["alpha_annualized_bca_low"]:.2%}, {ff5_diag["alpha_annualized_bca_high"]:.2%}] ({ff5_boot.attrs["n_boot"]:,} stationary-bootstrap resamples, mean block length {ff5_boot.attrs["block"]} months; all terms in `ff5_bootstrap_ci.csv`).
 
 ### FF5 exposures
 
@@ -208,6 +296,10 @@ Interpretation (best effort from signs/magnitudes):
 
 Chosen factors: **{", ".join(macro_factors)}**
 
+Selection: all {MACRO_MIN_FACTORS}-{MACRO_MAX_FACTORS} factor subsets of {len(available)} candidates ({", ".join(f"`{c}`" for c in available)}) were fitted on a common sample and ranked by BIC; the top {min(10, len(subset_tbl))} of {len(subset_tbl)} are below (full table with AIC, adjusted R² and 5-fold out-of-sample RMSE ranks in `macro_subset_search.csv`).
+
+{to_md_table(subset_tbl.head(10)[["factors", "n_obs", "adj_r2", "aic", "bic", "cv_rmse", "rank_adj_r2", "rank_cv"]]) if not subset_tbl.empty else "- Fewer than three candidates available; fell back to `mkt_rf`, `smb`, `hml`."}
+
 Rationale:
 - `mkt_rf`: broad equity risk premium.
 - `usd_ret`: broad USD move proxy for macro FX exposure.
@@ -220,12 +312,24 @@ Rationale:
 
 {to_md_table(macro_coef)}
 
+Block-bootstrap {macro_boot.attrs["level"]:.0%} BCa interval for annualized alpha: [{macro_diag["alpha_annualized_bca_low"]:.2%}, {macro_diag["alpha_annualized_bca_high"]:.2%}] (all terms in `macro_bootstrap_ci.csv`).
+
 ### Explainability vs FF5
 
 {to_md_table(compare_tbl)}
 
 Improvement in adjusted R² (macro model minus FF5 on same window): **{fit_delta:.4f}**.
 
+### Stability of exposures ({ROLLING_WINDOW_MONTHS}-month rolling windows)
+
+FF5 (full rolling series in `ff5_rolling_betas.csv`):
+
+{to_md_table(_rolling_summary(ff5_rolling, ["const"] + ff5_factors + ["adj_r2"])) if not ff5_rolling.empty else "- Sample shorter than one window."}
+
+Macro model (`macro_rolling_betas.csv`):
+
+{to_md_table(_rolling_summary(macro_rolling, ["const"] + macro_factors + ["adj_r2"])) if not macro_rolling.empty else "- Sample shorter than one window."}
+
 ### Do benchmark covariances make sense for global macro?
 
 Yes, more than FF5 alone. A global macro process should co-move with: